@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Visit
+from .models import Visit, VisitDaily
 
 
 @admin.register(Visit)
@@ -9,5 +9,15 @@ class VisitAdmin(admin.ModelAdmin):
     date_hierarchy = 'timestamp'
     readonly_fields = ['ip_address', 'timestamp']
     
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(VisitDaily)
+class VisitDailyAdmin(admin.ModelAdmin):
+    list_display = ['date', 'visits', 'unique_visitors', 'new_visitors']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'visits', 'unique_visitors', 'new_visitors']
+    
     def has_add_permission(self, request):
         return False
\ No newline at end of file
@@ -0,0 +1,191 @@
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_right
+from django.conf import settings
+from apps.hangout.redis_manager import get_sync_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_NETWORKS = (
+    "2a06:98c0:3600::/48",
+)
+
+REDIS_KEY = "analytics:blocklist"
+REDIS_VERSION_KEY = "analytics:blocklist:version"
+RELOAD_INTERVAL = 60  # seconds between checks of the file and redis
+
+
+def read_networks(path):
+    """One network per line, blank lines and # comments skipped"""
+    with open(path, encoding="utf-8") as networks_file:
+        lines = (line.split("#", 1)[0].strip() for line in networks_file)
+        return [line for line in lines if line]
+
+
+def parse_networks(networks):
+    """Valid networks out of `networks`, invalid entries are logged and skipped"""
+    parsed = []
+    for network in networks:
+        try:
+            parsed.append(ipaddress.ip_network(network.strip(), strict=False))
+        except ValueError:
+            logger.warning(f"Skipping invalid blocklist entry: {network!r}")
+    return parsed
+
+
+def _ip_to_int(ip):
+    """(version, integer) for an address string, None if it isn't one"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except (OSError, TypeError):
+        pass
+
+    try:
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+    except (OSError, TypeError):
+        return None
+
+    # ::ffff:a.b.c.d is checked against the ipv4 ranges
+    if value >> 32 == 0xFFFF:
+        return 4, value & 0xFFFFFFFF
+    return 6, value
+
+
+class IPBlocklist:
+    """CIDR blocklist as sorted, merged integer ranges searched with bisect"""
+
+    def __init__(self, networks=()):
+        self._tables = {4: ([], []), 6: ([], [])}
+        self.size = 0
+        self.load(networks)
+
+    def load(self, networks):
+        spans = {4: [], 6: []}
+        for network in parse_networks(networks):
+            spans[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+
+        tables = {}
+        for version, ranges in spans.items():
+            starts, ends = [], []
+            for start, end in sorted(ranges):
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            tables[version] = (starts, ends)
+
+        # readers see either the old or the new tables, never a mix
+        self._tables = tables
+        self.size = sum(len(starts) for starts, _ in tables.values())
+
+    def __contains__(self, ip):
+        address = _ip_to_int(ip)
+        if address is None:
+            return False
+
+        version, value = address
+        starts, ends = self._tables[version]
+        position = bisect_right(starts, value) - 1
+        return position >= 0 and value <= ends[position]
+
+
+class BlocklistLoader:
+    """Keeps the process blocklist in sync with the built-ins, the file and redis"""
+
+    def __init__(self, blocklist, path=""):
+        self.blocklist = blocklist
+        self.path = path
+        self._source_state = None
+        self._redis_version = None
+        self._redis_networks = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _state(self):
+        mtime = None
+        if self.path:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError as error:
+                logger.error(f"Failed to read blocklist file: {error}")
+
+        try:
+            version = get_sync_redis_client().get(REDIS_VERSION_KEY)
+        except Exception as error:
+            # an unreachable redis keeps the shared networks loaded last time
+            logger.error(f"Failed to read blocklist version: {error}")
+            version = self._redis_version
+
+        return mtime, version
+
+    def reload(self, force=False):
+        state = self._state()
+        if not force and state == self._source_state:
+            return False
+
+        version = state[1]
+        redis_networks = self._redis_networks
+        if version != self._redis_version:
+            # a failed read raises before anything is replaced, the next check retries
+            redis_networks = (
+                list(get_sync_redis_client().smembers(REDIS_KEY)) if version is not None else []
+            )
+
+        networks = list(DEFAULT_BLOCKED_NETWORKS)
+        if self.path and state[0] is not None:
+            networks.extend(read_networks(self.path))
+        networks.extend(redis_networks)
+
+        self.blocklist.load(networks)
+        self._redis_version = version
+        self._redis_networks = redis_networks
+        self._source_state = state
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                self.reload()
+            except Exception as error:
+                logger.error(f"Failed to reload blocklist: {error}")
+            time.sleep(RELOAD_INTERVAL)
+
+    def start(self):
+        """Start the background refresher once per process"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="blocklist-refresher", daemon=True
+                )
+                self._thread.start()
+
+
+blocklist = IPBlocklist(DEFAULT_BLOCKED_NETWORKS)
+loader = BlocklistLoader(blocklist, settings.ANALYTICS_BLOCKLIST_FILE)
+
+
+def is_blocked_ip(ip):
+    """Lookup only, refreshing happens in a background thread so async callers never block"""
+    loader.start()
+    return ip in blocklist
+
+
+def publish_networks(networks):
+    """Replace the shared redis blocklist, every process picks it up on its next check"""
+    client = get_sync_redis_client()
+    pipe = client.pipeline(transaction=True)
+    pipe.delete(REDIS_KEY)
+    if networks:
+        pipe.sadd(REDIS_KEY, *networks)
+    pipe.incr(REDIS_VERSION_KEY)
+    pipe.execute()
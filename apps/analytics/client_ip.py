@@ -0,0 +1,25 @@
+def forwarded_client_ip(x_forwarded_for, fallback):
+    """Address the trusted proxy appended, earlier X-Forwarded-For entries are client supplied"""
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(",")[-1].strip()
+        if ip:
+            return ip
+    return fallback
+
+
+def get_client_ip(request):
+    """Client address of a Django request"""
+    return forwarded_client_ip(
+        request.META.get("HTTP_X_FORWARDED_FOR", ""),
+        request.META.get("REMOTE_ADDR", "127.0.0.1"),
+    )
+
+
+def get_scope_client_ip(scope):
+    """Client address of an ASGI connection scope"""
+    headers = dict(scope.get("headers", []))
+    client = scope.get("client")
+    return forwarded_client_ip(
+        headers.get(b"x-forwarded-for", b"").decode("latin-1"),
+        client[0] if client else "unknown",
+    )
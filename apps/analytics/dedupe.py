@@ -0,0 +1,89 @@
+import threading
+import time
+from .ingest import VISIT_WINDOW
+
+
+MAX_BUCKET_SIZE = 100_000
+
+
+class RecentVisitors:
+    """Per-process memory of ips recorded within the visit window
+
+    Two rotating sets each span half the window. Only ips redis just marked
+    as new are kept, and each is dropped within one window of the check, so
+    the local copy never outlives the redis marker. Misses fall through to
+    redis, which holds the authoritative answer.
+    """
+
+    def __init__(self, window, max_bucket_size=MAX_BUCKET_SIZE):
+        self.span = window / 2
+        self.max_bucket_size = max_bucket_size
+        self._current = set()
+        self._previous = set()
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.local_hits = 0
+        self.redis_new = 0
+        self.redis_repeats = 0
+        self.redis_errors = 0
+
+    def _rotate(self, now):
+        with self._lock:
+            elapsed = now - self._rotated_at
+            if elapsed < self.span:
+                return
+            if elapsed < 2 * self.span:
+                # buckets keep fixed boundaries even when rotation runs late
+                self._previous = self._current
+                self._rotated_at += self.span
+            else:
+                # after a quiet spell longer than the window both sets are stale
+                self._previous = set()
+                self._rotated_at = now
+            self._current = set()
+
+    def seen(self, ip):
+        now = time.monotonic()
+        if now - self._rotated_at >= self.span:
+            self._rotate(now)
+
+        if ip in self._current or ip in self._previous:
+            self.local_hits += 1
+            return True
+        return False
+
+    def remember(self, ip, new, checked_at):
+        """Note redis' verdict for an ip that missed locally and was checked at `checked_at`"""
+        if not new:
+            # the marker's remaining lifetime is unknown, so repeats stay in redis
+            self.redis_repeats += 1
+            return
+
+        self.redis_new += 1
+        # a bucket started after the check could keep the ip past the marker's expiry
+        if checked_at >= self._rotated_at and len(self._current) < self.max_bucket_size:
+            self._current.add(ip)
+
+    def failed(self):
+        self.redis_errors += 1
+
+    def stats(self):
+        redis_checks = self.redis_new + self.redis_repeats + self.redis_errors
+        lookups = self.local_hits + redis_checks
+        return {
+            "lookups": lookups,
+            "local_hits": self.local_hits,
+            "redis_checks": redis_checks,
+            "redis_new": self.redis_new,
+            "redis_repeats": self.redis_repeats,
+            "redis_errors": self.redis_errors,
+            "local_hit_rate": self.local_hits / lookups if lookups else 0.0,
+        }
+
+
+recent_visitors = RecentVisitors(VISIT_WINDOW)
+
+
+def get_dedupe_stats():
+    return recent_visitors.stats()
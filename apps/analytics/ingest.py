@@ -0,0 +1,115 @@
+import ipaddress
+import json
+import logging
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.hangout.redis_manager import get_sync_redis_client
+from .models import Visit, hash_ip
+from .stats import DAY_KEY_TIMEOUT, visit_keys
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "analytics:visits:queue"
+SEEN_KEY = "analytics:visits:seen:{ip}"
+VISIT_WINDOW = 5 * 60  # repeat requests from an ip within this count once
+LOCK_KEY = "analytics:visits:lock"
+LOCK_TIMEOUT = 10 * 60
+DRAIN_BATCH_SIZE = 5000
+
+
+# dedupe, queue and count in one atomic round-trip, repeats touch nothing else
+RECORD_VISIT_SCRIPT = """
+if not redis.call("SET", KEYS[1], "1", "NX", "EX", ARGV[1]) then
+    return 0
+end
+redis.call("RPUSH", KEYS[2], ARGV[2])
+redis.call("INCR", KEYS[3])
+redis.call("PFADD", KEYS[4], ARGV[3])
+redis.call("PFADD", KEYS[5], ARGV[3])
+redis.call("EXPIRE", KEYS[5], ARGV[4])
+return 1
+"""
+
+_record_visit = None
+
+
+def record_visit(ip_address):
+    """Queue and count a visit unless the ip was seen within the window, True if new"""
+    global _record_visit
+
+    client = get_sync_redis_client()
+    if _record_visit is None:
+        _record_visit = client.register_script(RECORD_VISIT_SCRIPT)
+
+    now = timezone.now()
+    total_key, all_key, day_key = visit_keys(now)
+    return bool(_record_visit(
+        keys=[SEEN_KEY.format(ip=ip_address), QUEUE_KEY, total_key, all_key, day_key],
+        args=[
+            VISIT_WINDOW,
+            json.dumps({"ip": ip_address, "ts": now.isoformat()}),
+            hash_ip(ip_address),
+            DAY_KEY_TIMEOUT,
+        ],
+        client=client,
+    ))
+
+
+@contextmanager
+def ingest_lock():
+    """Hold the lock that keeps drains and reconciliation apart, yields False if taken"""
+    acquired = cache.add(LOCK_KEY, True, LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(LOCK_KEY)
+
+
+def _pop_batch(client, size):
+    pipe = client.pipeline(transaction=True)
+    pipe.lrange(QUEUE_KEY, 0, size - 1)
+    pipe.ltrim(QUEUE_KEY, size, -1)
+    items, _ = pipe.execute()
+    return items
+
+
+def _parse(item):
+    try:
+        entry = json.loads(item)
+        ipaddress.ip_address(entry["ip"])
+        return Visit(ip_address=entry["ip"], timestamp=parse_datetime(entry["ts"]))
+    except (ValueError, KeyError, TypeError):
+        logger.warning(f"Dropping malformed queued visit: {item[:100]}")
+        return None
+
+
+def drain_visit_queue(batch_size=DRAIN_BATCH_SIZE):
+    """Write queued visits in batches, returns the visits written"""
+    client = get_sync_redis_client()
+    written = []
+
+    while True:
+        items = _pop_batch(client, batch_size)
+        if not items:
+            break
+
+        visits = [visit for visit in map(_parse, items) if visit is not None]
+
+        try:
+            Visit.objects.bulk_create(visits, batch_size=1000)
+        except Exception as error:
+            # put the batch back in front so nothing is lost, the next run retries it
+            client.lpush(QUEUE_KEY, *reversed(items))
+            logger.error(f"Failed to write {len(visits)} queued visits: {error}")
+            break
+
+        written.extend(visits)
+
+        if len(items) < batch_size:
+            break
+
+    return written
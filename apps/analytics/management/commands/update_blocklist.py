@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.analytics.blocklist import parse_networks, publish_networks, read_networks
+
+
+class Command(BaseCommand):
+    help = "replace the shared ip blocklist in redis with the networks in a file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            help="file with one ip network per line"
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="empty the shared blocklist"
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            networks = []
+        elif options["path"]:
+            try:
+                networks = [str(network) for network in parse_networks(read_networks(options["path"]))]
+            except OSError as error:
+                raise CommandError(f"cannot read {options['path']}: {error}")
+        else:
+            raise CommandError("give a networks file or --clear")
+
+        publish_networks(networks)
+        self.stdout.write(self.style.SUCCESS(f"{len(networks)} networks published"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_visit_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('unique_visitors', models.PositiveIntegerField(default=0)),
+                ('new_visitors', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily visits',
+                'verbose_name_plural': 'Daily visits',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Visitor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ip_address', models.GenericIPAddressField(unique=True)),
+                ('first_seen', models.DateField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def hash_visitor_ips(apps, schema_editor):
+    Visitor = apps.get_model("analytics", "Visitor")
+    salt = settings.ANALYTICS_VISITOR_SALT.encode("utf-8")
+
+    visitors = []
+    for visitor in Visitor.objects.only("id", "ip_address").iterator(chunk_size=1000):
+        visitor.ip_hash = hmac.new(
+            salt, visitor.ip_address.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        visitors.append(visitor)
+        if len(visitors) == 1000:
+            Visitor.objects.bulk_update(visitors, ["ip_hash"])
+            visitors = []
+
+    if visitors:
+        Visitor.objects.bulk_update(visitors, ["ip_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_visit_rollups'),
+    ]
+
+    # raw addresses are dropped, there is nothing to migrate back to
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='ip_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(hash_visitor_ips),
+        migrations.RemoveField(
+            model_name='visitor',
+            name='ip_address',
+        ),
+        migrations.AlterField(
+            model_name='visitor',
+            name='ip_hash',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
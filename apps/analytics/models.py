@@ -1,19 +1,87 @@
+import hashlib
+import hmac
+from datetime import datetime, time, timedelta
+from django.conf import settings
 from django.db import models
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+
+def day_start(day):
+    """Aware datetime at which `day` begins in the current time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def hash_ip(ip_address):
+    """Salted digest standing in for an ip wherever it outlives the raw visits"""
+    return hmac.new(
+        settings.ANALYTICS_VISITOR_SALT.encode("utf-8"),
+        ip_address.encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
 
 
 class Visit(models.Model):
     ip_address = models.GenericIPAddressField()
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # not auto_now_add so queued visits keep the time of the request
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     
     class Meta:
         ordering = ["-timestamp"]
     
     def __str__(self):
         return f"{self.ip_address} - {self.timestamp}"
+
+    @classmethod
+    def not_rolled_up(cls):
+        """Raw visits from days that have no VisitDaily rollup yet"""
+        last = VisitDaily.objects.aggregate(last=Max("date"))["last"]
+        visits = cls.objects.order_by()
+        if last is not None:
+            visits = visits.filter(timestamp__gte=day_start(last + timedelta(days=1)))
+        return visits
     
     @classmethod
     def get_stats(cls):
+        """Exact totals from the daily rollups plus the raw visits not rolled up yet"""
+        rolled = VisitDaily.objects.aggregate(
+            visits=Sum("visits"), visitors=Sum("new_visitors")
+        )
+        recent = cls.not_rolled_up()
+        hashes = {
+            hash_ip(ip_address)
+            for ip_address in recent.values_list("ip_address", flat=True).distinct()
+        }
+        known = Visitor.objects.filter(ip_hash__in=hashes).count()
+
         return {
-            "total_visits": cls.objects.count(),
-            "unique_visitors": cls.objects.values("ip_address").distinct().count(),
-        }
\ No newline at end of file
+            "total_visits": (rolled["visits"] or 0) + recent.count(),
+            "unique_visitors": (rolled["visitors"] or 0) + len(hashes) - known,
+        }
+
+
+class VisitDaily(models.Model):
+    date = models.DateField(unique=True)
+    visits = models.PositiveIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    new_visitors = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-date"]
+        verbose_name = "Daily visits"
+        verbose_name_plural = "Daily visits"
+
+    def __str__(self):
+        return f"{self.date} - {self.visits} visits"
+
+
+class Visitor(models.Model):
+    """Every visitor ever rolled up with the day it was first seen, outlives pruned visits
+
+    Only the salted hash of the ip is kept, raw addresses go with the pruned visits.
+    """
+    ip_hash = models.CharField(max_length=64, unique=True)
+    first_seen = models.DateField(db_index=True)
+
+    def __str__(self):
+        return f"{self.ip_hash[:12]} - {self.first_seen}"
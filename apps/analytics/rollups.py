@@ -0,0 +1,98 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Visit, VisitDaily, Visitor, day_start, hash_ip
+
+
+# the last rolled days are rolled again so late queued visits still land
+REROLL_DAYS = 2
+# weekly unique counts are refilled from raw visits, keep at least that much
+MIN_RETENTION_DAYS = 8
+
+BATCH_SIZE = 1000
+PRUNE_CHUNK_SIZE = 5000
+
+
+def roll_up_visits():
+    """Roll every completed day of raw visits into VisitDaily, safe to re-run"""
+    today = timezone.localdate()
+    last = VisitDaily.objects.aggregate(last=Max("date"))["last"]
+
+    if last is not None:
+        start = last - timedelta(days=REROLL_DAYS - 1)
+    else:
+        first = Visit.objects.aggregate(first=Min("timestamp"))["first"]
+        if first is None:
+            return []
+        start = timezone.localdate(first)
+
+    if start >= today:
+        return []
+
+    visits = Visit.objects.order_by().filter(
+        timestamp__gte=day_start(start), timestamp__lt=day_start(today)
+    ).annotate(day=TruncDate("timestamp"))
+
+    # existing visitors keep their earlier first_seen
+    first_seen = visits.values("ip_address").annotate(first_seen=Min("day"))
+    Visitor.objects.bulk_create(
+        (
+            Visitor(ip_hash=hash_ip(row["ip_address"]), first_seen=row["first_seen"])
+            for row in first_seen.iterator(chunk_size=BATCH_SIZE)
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    new_visitors = dict(
+        Visitor.objects.filter(first_seen__gte=start, first_seen__lt=today)
+        .values("first_seen")
+        .annotate(count=Count("id"))
+        .values_list("first_seen", "count")
+    )
+    days = [
+        VisitDaily(
+            date=row["day"],
+            visits=row["visits"],
+            unique_visitors=row["unique_visitors"],
+            new_visitors=new_visitors.get(row["day"], 0),
+        )
+        for row in visits.values("day").annotate(
+            visits=Count("id"), unique_visitors=Count("ip_address", distinct=True)
+        )
+    ]
+    VisitDaily.objects.bulk_create(
+        days,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=["visits", "unique_visitors", "new_visitors"],
+    )
+
+    return [day.date for day in days]
+
+
+def prune_raw_visits():
+    """Delete rolled up raw visits older than the retention window, returns the count"""
+    last = VisitDaily.objects.aggregate(last=Max("date"))["last"]
+    if last is None:
+        return 0
+
+    retention = max(settings.ANALYTICS_RAW_RETENTION_DAYS, MIN_RETENTION_DAYS)
+    cutoff = min(
+        timezone.localdate() - timedelta(days=retention),
+        last - timedelta(days=REROLL_DAYS - 1),
+    )
+    old_visits = Visit.objects.order_by().filter(timestamp__lt=day_start(cutoff))
+
+    # small chunks keep each delete's locks and transaction short
+    deleted = 0
+    while True:
+        ids = list(old_visits.values_list("id", flat=True)[:PRUNE_CHUNK_SIZE])
+        if not ids:
+            break
+        deleted += Visit.objects.filter(id__in=ids).delete()[0]
+
+    return deleted
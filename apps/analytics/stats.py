@@ -0,0 +1,133 @@
+import logging
+from datetime import timedelta
+from django.utils import timezone
+from redis.exceptions import RedisError
+from apps.hangout.redis_manager import get_sync_redis_client
+from .models import Visit, Visitor, hash_ip
+
+
+logger = logging.getLogger(__name__)
+
+TOTAL_KEY = "analytics:visits:total"
+# sketches count salted ip hashes, the same ones Visitor keeps
+ALL_VISITORS_KEY = "analytics:visitor-hashes:all"
+DAY_VISITORS_KEY = "analytics:visitor-hashes:{day}"
+SEEDED_KEY = "{key}:seeded"
+
+WEEK_DAYS = 7
+DAY_KEY_TIMEOUT = 60 * 60 * 24 * (WEEK_DAYS + 1)
+FILL_CHUNK_SIZE = 1000
+
+
+def _day_key(day):
+    return DAY_VISITORS_KEY.format(day=day.isoformat())
+
+
+def _week_keys(today):
+    return [_day_key(today - timedelta(days=offset)) for offset in range(WEEK_DAYS)]
+
+
+def visit_keys(now):
+    """(total counter, all-time sketch, day sketch) keys a visit at `now` updates"""
+    return TOTAL_KEY, ALL_VISITORS_KEY, _day_key(timezone.localdate(now))
+
+
+def get_visit_stats():
+    """Total visits and estimated unique visitors today, this week and all time"""
+    week_keys = _week_keys(timezone.localdate())
+
+    try:
+        pipe = get_sync_redis_client().pipeline(transaction=False)
+        pipe.get(TOTAL_KEY)
+        pipe.pfcount(ALL_VISITORS_KEY)
+        pipe.pfcount(week_keys[0])
+        pipe.pfcount(*week_keys)
+        total, unique, unique_today, unique_week = pipe.execute()
+    except RedisError as error:
+        logger.error(f"Failed to read visit stats: {error}")
+        total = None
+
+    if total is None:
+        # not seeded yet, the reconciliation task fills the counters in
+        stats = Visit.get_stats()
+        stats.update(unique_today=0, unique_week=0)
+        return stats
+
+    return {
+        "total_visits": int(total),
+        "unique_visitors": unique,
+        "unique_today": unique_today,
+        "unique_week": unique_week,
+    }
+
+
+def _fill(client, key, *hash_lists):
+    """PFADD every hash of the `hash_lists` iterables into `key`"""
+    for hashes in hash_lists:
+        chunk = []
+        for ip_hash in hashes:
+            chunk.append(ip_hash)
+            if len(chunk) == FILL_CHUNK_SIZE:
+                client.pfadd(key, *chunk)
+                chunk = []
+
+        if chunk:
+            client.pfadd(key, *chunk)
+
+
+def _distinct_hashes(visits):
+    ips = visits.order_by().values_list("ip_address", flat=True).distinct()
+    return (hash_ip(ip_address) for ip_address in ips.iterator(chunk_size=FILL_CHUNK_SIZE))
+
+
+def reconcile_visit_stats(pending_key):
+    """Correct counter drift against the database, rebuild lost HyperLogLogs
+
+    Must run while nothing drains `pending_key` into the database.
+    """
+    client = get_sync_redis_client()
+
+    pipe = client.pipeline(transaction=True)
+    pipe.get(TOTAL_KEY)
+    pipe.llen(pending_key)
+    counted, pending = pipe.execute()
+
+    # queued visits are already counted but not stored yet
+    drift = Visit.get_stats()["total_visits"] + pending - int(counted or 0)
+    if drift:
+        client.incrby(TOTAL_KEY, drift)
+
+    # live PFADDs recreate a lost key, so a marker tells whether it holds the history
+    today = timezone.localdate()
+    # pruned visits live on in Visitor, the last week is always still raw
+    sketches = [(
+        ALL_VISITORS_KEY,
+        [
+            Visitor.objects.values_list("ip_hash", flat=True).iterator(
+                chunk_size=FILL_CHUNK_SIZE
+            ),
+            _distinct_hashes(Visit.not_rolled_up()),
+        ],
+        None,
+    )]
+    for offset in range(WEEK_DAYS):
+        day = today - timedelta(days=offset)
+        sketches.append((
+            _day_key(day),
+            [_distinct_hashes(Visit.objects.filter(timestamp__date=day))],
+            DAY_KEY_TIMEOUT,
+        ))
+
+    rebuilt = []
+    for key, ip_lists, timeout in sketches:
+        seeded_key = SEEDED_KEY.format(key=key)
+        if client.exists(seeded_key):
+            continue
+
+        _fill(client, key, *ip_lists)
+        client.set(seeded_key, 1, ex=timeout)
+        if timeout:
+            client.expire(key, timeout)
+        rebuilt.append(key)
+
+    return {"drift": drift, "rebuilt": rebuilt}
@@ -1,7 +1,42 @@
 from celery import shared_task
-from .models import Visit
+from .ingest import QUEUE_KEY, drain_visit_queue, ingest_lock
+from .rollups import prune_raw_visits, roll_up_visits
+from .stats import reconcile_visit_stats
 
 
 @shared_task
-def record_visit_async(ip_address):
-    Visit.objects.create(ip_address=ip_address)
\ No newline at end of file
+def ingest_visits():
+    with ingest_lock() as acquired:
+        if not acquired:
+            return {"skipped": True}
+        visits = drain_visit_queue()
+
+    return {"ingested": len(visits)}
+
+
+@shared_task(bind=True, max_retries=6)
+def reconcile_visits(self):
+    with ingest_lock() as acquired:
+        if not acquired:
+            raise self.retry(countdown=30)
+        return reconcile_visit_stats(QUEUE_KEY)
+
+
+@shared_task(bind=True, max_retries=6)
+def rollup_visits(self):
+    with ingest_lock() as acquired:
+        if not acquired:
+            raise self.retry(countdown=30)
+        days = roll_up_visits()
+
+    return {"days": len(days)}
+
+
+@shared_task(bind=True, max_retries=6)
+def prune_visits(self):
+    with ingest_lock() as acquired:
+        if not acquired:
+            raise self.retry(countdown=30)
+        deleted = prune_raw_visits()
+
+    return {"deleted": deleted}
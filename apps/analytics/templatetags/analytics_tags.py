@@ -1,13 +1,15 @@
 from django import template
-from apps.analytics.models import Visit
+from apps.analytics.stats import get_visit_stats
 
 register = template.Library()
 
 
 @register.inclusion_tag('analytics/visitors_widget.html')
 def visitors_widget():
-    stats = Visit.get_stats()
+    stats = get_visit_stats()
     return {
         'total_visits': stats['total_visits'],
         'unique_visitors': stats['unique_visitors'],
+        'unique_today': stats['unique_today'],
+        'unique_week': stats['unique_week'],
     }
\ No newline at end of file
@@ -0,0 +1,193 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+from redis.exceptions import ConnectionError as RedisConnectionError
+from apps.analytics import blocklist as blocklist_module
+from apps.analytics.blocklist import BlocklistLoader, IPBlocklist
+from apps.analytics.client_ip import get_client_ip, get_scope_client_ip
+from apps.analytics.dedupe import RecentVisitors
+from apps.analytics.models import Visit, Visitor, day_start, hash_ip
+from apps.analytics.rollups import roll_up_visits
+
+
+WINDOW = 300
+
+
+class RecentVisitorsTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("apps.analytics.dedupe.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.visitors = RecentVisitors(WINDOW)
+
+    def test_repeat_verdict_is_not_cached(self):
+        self.assertFalse(self.visitors.seen("1.1.1.1"))
+        self.visitors.remember("1.1.1.1", False, self.now)
+
+        self.assertFalse(self.visitors.seen("1.1.1.1"))
+
+    def test_new_verdict_is_cached_within_the_window(self):
+        self.visitors.seen("1.1.1.1")
+        self.visitors.remember("1.1.1.1", True, self.now)
+
+        self.now += WINDOW - 1
+        self.assertTrue(self.visitors.seen("1.1.1.1"))
+
+    def test_local_copy_expires_with_the_redis_marker(self):
+        self.visitors.seen("1.1.1.1")
+        checked_at = self.now
+        self.visitors.remember("1.1.1.1", True, checked_at)
+
+        # the first lookup after the check comes late and rotates late
+        self.now = checked_at + WINDOW - 1
+        self.assertTrue(self.visitors.seen("1.1.1.1"))
+
+        # redis' SET NX EX marker is gone from here on
+        self.now = checked_at + WINDOW
+        self.assertFalse(self.visitors.seen("1.1.1.1"))
+
+    def test_rotation_during_the_check_skips_caching(self):
+        self.visitors.seen("1.1.1.1")
+        checked_at = self.now
+
+        self.now += WINDOW / 2
+        self.visitors.seen("2.2.2.2")  # rotates while the redis call is in flight
+        self.visitors.remember("1.1.1.1", True, checked_at)
+
+        self.assertFalse(self.visitors.seen("1.1.1.1"))
+
+
+class BlocklistLoaderTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = mock.Mock()
+        self.redis.get.return_value = "1"
+        self.redis.smembers.return_value = {"203.0.113.0/24"}
+        patcher = mock.patch.object(
+            blocklist_module, "get_sync_redis_client", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "blocklist.txt")
+        self._write("198.51.100.0/24")
+
+        self.blocklist = IPBlocklist()
+        self.loader = BlocklistLoader(self.blocklist, self.path)
+        self.loader.reload()
+
+    def _write(self, *networks):
+        with open(self.path, "w", encoding="utf-8") as networks_file:
+            networks_file.write("\n".join(networks))
+
+    def test_loads_file_and_redis_networks(self):
+        self.assertIn("198.51.100.7", self.blocklist)
+        self.assertIn("203.0.113.7", self.blocklist)
+
+    def test_redis_error_keeps_the_shared_networks(self):
+        self.redis.get.side_effect = RedisConnectionError("down")
+        self._write("198.51.100.0/24", "192.0.2.0/24")
+        os.utime(self.path, (0, 0))
+
+        self.assertTrue(self.loader.reload())
+
+        self.assertIn("192.0.2.7", self.blocklist)
+        self.assertIn("203.0.113.7", self.blocklist)
+
+    def test_failed_members_read_keeps_the_old_list(self):
+        self.redis.get.return_value = "2"
+        self.redis.smembers.side_effect = RedisConnectionError("down")
+
+        with self.assertRaises(RedisConnectionError):
+            self.loader.reload()
+
+        self.assertIn("203.0.113.7", self.blocklist)
+
+
+class ClientIpTests(SimpleTestCase):
+    def test_request_uses_the_proxy_appended_entry(self):
+        request = RequestFactory().get(
+            "/", HTTP_X_FORWARDED_FOR="6.6.6.6, 203.0.113.7", REMOTE_ADDR="10.0.0.1"
+        )
+        self.assertEqual(get_client_ip(request), "203.0.113.7")
+
+    def test_request_without_header_uses_remote_addr(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(get_client_ip(request), "10.0.0.1")
+
+    def test_scope_uses_the_proxy_appended_entry(self):
+        scope = {
+            "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.7")],
+            "client": ("10.0.0.1", 5000),
+        }
+        self.assertEqual(get_scope_client_ip(scope), "203.0.113.7")
+
+
+class RuntimeStatsTests(TestCase):
+    def test_staff_sees_every_counter(self):
+        staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get("/admin/runtime-stats/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("memory_hits", response.json()["code_highlighting"])
+
+
+class VisitorTests(TestCase):
+    def _visit(self, ip_address, days_ago):
+        day = timezone.localdate() - timedelta(days=days_ago)
+        Visit.objects.create(ip_address=ip_address, timestamp=day_start(day) + timedelta(hours=1))
+
+    def test_rollup_keeps_hashes_not_addresses(self):
+        self._visit("192.0.2.1", 2)
+        self._visit("192.0.2.2", 1)
+
+        roll_up_visits()
+
+        self.assertQuerySetEqual(
+            Visitor.objects.values_list("ip_hash", flat=True),
+            [hash_ip("192.0.2.1"), hash_ip("192.0.2.2")],
+            ordered=False,
+        )
+
+    def test_returning_visitor_is_not_counted_again(self):
+        self._visit("192.0.2.1", 2)
+        self._visit("192.0.2.2", 1)
+        roll_up_visits()
+
+        self._visit("192.0.2.1", 0)
+        self._visit("192.0.2.3", 0)
+
+        self.assertEqual(Visit.get_stats(), {"total_visits": 4, "unique_visitors": 3})
+
+
+class IPBlocklistTests(SimpleTestCase):
+    def test_overlapping_and_adjacent_ranges_are_merged(self):
+        blocklist = IPBlocklist([
+            "10.0.0.0/25", "10.0.0.128/25", "10.0.0.64/26", "10.0.2.0/24", "2001:db8::/32",
+        ])
+
+        self.assertEqual(blocklist.size, 3)
+        self.assertIn("10.0.0.0", blocklist)
+        self.assertIn("10.0.0.255", blocklist)
+        self.assertNotIn("10.0.1.0", blocklist)
+        self.assertIn("10.0.2.255", blocklist)
+        self.assertIn("2001:db8::1", blocklist)
+
+    def test_mapped_ipv6_is_checked_as_ipv4(self):
+        blocklist = IPBlocklist(["192.0.2.0/24"])
+
+        self.assertIn("::ffff:192.0.2.9", blocklist)
+
+    def test_invalid_entries_and_addresses_are_ignored(self):
+        blocklist = IPBlocklist(["not a network", "192.0.2.0/24"])
+
+        self.assertEqual(blocklist.size, 1)
+        self.assertNotIn("unknown", blocklist)
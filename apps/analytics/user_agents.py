@@ -0,0 +1,121 @@
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOT_PATTERNS = (
+    "bot", "crawl", "spider", "scrape", "monitor", "check", "scan", "test",
+    "wget", "curl", "python", "java", "http", "lighthouse", "pingdom", "uptime",
+    "statuspage", "newrelic", "datadog", "nagios", "zabbix", "prometheus",
+    "headless", "phantom", "selenium", "go-http", "okhttp", "apache",
+)
+
+CACHE_SIZE = 4096
+RELOAD_INTERVAL = 30  # seconds between checks of the patterns file
+
+
+def _compile(patterns):
+    return re.compile("|".join(patterns), re.IGNORECASE)
+
+
+def _read_patterns(path):
+    """One regex per line, blank lines and # comments skipped"""
+    with open(path, encoding="utf-8") as patterns_file:
+        lines = (line.strip() for line in patterns_file)
+        return tuple(line for line in lines if line and not line.startswith("#"))
+
+
+class UserAgentClassifier:
+    """Bot detection shared by http and websocket code, memoised per user agent"""
+
+    def __init__(self, patterns=DEFAULT_BOT_PATTERNS, patterns_file="", cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self.patterns_file = patterns_file
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._file_mtime = None
+        self._next_check = 0.0
+        self.load(patterns)
+
+    def load(self, patterns):
+        """Swap in a new pattern list, cached verdicts go with the old one"""
+        bot_pattern = _compile(patterns)
+
+        @lru_cache(maxsize=self.cache_size)
+        def classify(user_agent):
+            user_agent = user_agent.lower()
+
+            if not user_agent or len(user_agent) < 10:
+                return True
+
+            if not user_agent.startswith("mozilla/"):
+                return True
+
+            return bot_pattern.search(user_agent) is not None
+
+        self.patterns = tuple(patterns)
+        self._classify = classify
+
+    def reload_if_changed(self):
+        """Reload patterns from the patterns file when it changed on disk"""
+        if not self.patterns_file:
+            return False
+
+        with self._lock:
+            try:
+                mtime = os.stat(self.patterns_file).st_mtime
+            except OSError as error:
+                logger.error(f"Failed to read bot patterns: {error}")
+                return False
+
+            if mtime == self._file_mtime:
+                return False
+            # a broken file is reported once and retried only after it changes
+            self._file_mtime = mtime
+
+            try:
+                patterns = _read_patterns(self.patterns_file)
+                self.load(patterns or DEFAULT_BOT_PATTERNS)
+            except (OSError, re.error) as error:
+                logger.error(f"Failed to load bot patterns: {error}")
+                return False
+
+            self.reloads += 1
+            return True
+
+    def is_bot(self, user_agent):
+        now = time.monotonic()
+        if self.patterns_file and now >= self._next_check:
+            self._next_check = now + RELOAD_INTERVAL
+            self.reload_if_changed()
+
+        return self._classify(user_agent or "")
+
+    def stats(self):
+        info = self._classify.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "size": info.currsize,
+            "patterns": len(self.patterns),
+            "reloads": self.reloads,
+        }
+
+
+classifier = UserAgentClassifier(patterns_file=settings.ANALYTICS_BOT_PATTERNS_FILE)
+
+
+def is_bot(user_agent):
+    return classifier.is_bot(user_agent)
+
+
+def get_classifier_stats():
+    return classifier.stats()
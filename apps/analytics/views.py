@@ -0,0 +1,23 @@
+import os
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from apps.hangout.consumers import get_broadcaster_stats
+from apps.hangout.redis_manager import get_async_pool_stats
+from apps.weblog.rendering import get_highlight_stats
+from .dedupe import get_dedupe_stats
+from .user_agents import get_classifier_stats
+
+
+@never_cache
+@staff_member_required
+def runtime_stats(request):
+    """In-process counters of the worker that served this request"""
+    return JsonResponse({
+        "pid": os.getpid(),
+        "user_agent_classifier": get_classifier_stats(),
+        "visit_dedupe": get_dedupe_stats(),
+        "redis_async_pool": get_async_pool_stats(),
+        "discord_broadcaster": get_broadcaster_stats(),
+        "code_highlighting": get_highlight_stats(),
+    })
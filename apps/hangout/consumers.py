@@ -1,16 +1,87 @@
 import json
-import re
 import asyncio
 import hashlib
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
 from decouple import config
+from apps.analytics import user_agents
+from apps.analytics.blocklist import is_blocked_ip
+from apps.analytics.client_ip import get_scope_client_ip
 from .models import Message
-from .online_tracker import OnlineUserTracker
+from .online_tracker import OnlineCountTicker, OnlineUserTracker
 from .redis_manager import get_async_redis_client
 
 
+DROP_OLDEST = "drop_oldest"
+CLOSE = "close"
+
+
+def message_frame(nickname, content, timestamp, is_highlighted=False, from_discord=False):
+    """The websocket text for a chat line, built once and sent to every socket as-is"""
+    return json.dumps({
+        'type': 'message',
+        'nickname': nickname,
+        'content': content,
+        'timestamp': timestamp,
+        'is_highlighted': is_highlighted,
+        'from_discord': from_discord
+    })
+
+
+def discord_frame(data):
+    """Frame for a discord_to_web payload, None when it can't be used"""
+    try:
+        message_data = json.loads(data)
+        return message_frame(
+            message_data['nickname'],
+            message_data['content'],
+            message_data['timestamp'],
+            is_highlighted=message_data.get('is_highlighted', False),
+            from_discord=True
+        )
+    except json.JSONDecodeError:
+        print(f"Invalid JSON from Discord")
+    except Exception as error:
+        print(f"Error processing Discord message: {error}")
+    return None
+
+
+class Subscription:
+    """One subscriber's bounded outbound queue, drained by its own task"""
+
+    def __init__(self, callback, max_size, overflow_policy, on_overflow=None):
+        self.callback = callback
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.overflow_policy = overflow_policy
+        self.on_overflow = on_overflow
+        self.dropped = 0
+        self.task = asyncio.create_task(self._drain())
+
+    def offer(self, data):
+        """Queue a frame without waiting, False once the subscriber has to go"""
+        if self.queue.full():
+            if self.overflow_policy == CLOSE:
+                self.dropped += 1
+                return False
+            self.queue.get_nowait()
+            self.dropped += 1
+
+        self.queue.put_nowait(data)
+        return True
+
+    async def _drain(self):
+        while True:
+            data = await self.queue.get()
+            try:
+                await self.callback(data)
+            except Exception as err:
+                print(f"Error broadcasting to subscriber: {err}")
+
+    def cancel(self):
+        self.task.cancel()
+
+
 class DiscordMessageBroadcaster:
     _instance = None
     _lock = asyncio.Lock()
@@ -19,7 +90,15 @@ class DiscordMessageBroadcaster:
         self.redis_client = None
         self.pubsub = None
         self.listener_task = None
-        self.subscribers = set()
+        self.subscribers = {}
+        self.queue_size = config("HANGOUT_SUBSCRIBER_QUEUE_SIZE", default=100, cast=int)
+        self.overflow_policy = config(
+            "HANGOUT_OVERFLOW_POLICY",
+            default=DROP_OLDEST,
+            cast=lambda policy: policy if policy in (DROP_OLDEST, CLOSE) else DROP_OLDEST
+        )
+        self.dropped_frames = 0
+        self.closed_subscribers = 0
         
     @classmethod
     async def get_instance(cls):
@@ -42,23 +121,60 @@ class DiscordMessageBroadcaster:
         try:
             async for message in self.pubsub.listen():
                 if message['type'] == 'message':
-                    for subscriber in list(self.subscribers):
-                        try:
-                            await subscriber(message['data'])
-                        except Exception as err:
-                            print(f"Error broadcasting to subscriber: {err}")
+                    frame = discord_frame(message['data'])
+                    if frame is not None:
+                        self.publish(frame)
 
         except asyncio.CancelledError:
             print("[Broadcaster] Listener cancelled")
 
         except Exception as err:
             print(f"[Broadcaster] Error in listener: {err}")
+
+    def publish(self, data):
+        """Hand a frame to every subscriber's queue, never waits on a socket"""
+        for callback, subscription in list(self.subscribers.items()):
+            dropped = subscription.dropped
+            accepted = subscription.offer(data)
+            self.dropped_frames += subscription.dropped - dropped
+
+            if not accepted:
+                self._drop_subscriber(callback)
+                self.closed_subscribers += 1
+                if subscription.on_overflow:
+                    asyncio.create_task(subscription.on_overflow())
     
-    async def subscribe(self, callback):
-        self.subscribers.add(callback)
+    async def subscribe(self, callback, on_overflow=None):
+        """`on_overflow` is awaited when the close policy gives up on this subscriber"""
+        if callback not in self.subscribers:
+            self.subscribers[callback] = Subscription(
+                callback, self.queue_size, self.overflow_policy, on_overflow
+            )
     
     async def unsubscribe(self, callback):
-        self.subscribers.discard(callback)
+        self._drop_subscriber(callback)
+
+    def _drop_subscriber(self, callback):
+        subscription = self.subscribers.pop(callback, None)
+        if subscription:
+            subscription.cancel()
+
+    def stats(self):
+        depths = [subscription.queue.qsize() for subscription in self.subscribers.values()]
+        return {
+            "subscribers": len(depths),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy,
+            "dropped_frames": self.dropped_frames,
+            "closed_subscribers": self.closed_subscribers,
+        }
+
+
+def get_broadcaster_stats():
+    broadcaster = DiscordMessageBroadcaster._instance
+    return broadcaster.stats() if broadcaster else None
 
 
 class HangoutConsumer(AsyncWebsocketConsumer):
@@ -71,6 +187,10 @@ class HangoutConsumer(AsyncWebsocketConsumer):
         self.user_id = None
         self.last_message_time = {}
         self.broadcaster = None
+        self.ticker = None
+        self.counted_online = False
+        # shared by every consumer in the process, never closed here
+        self.redis_client = get_async_redis_client()
 
         self.banned_words = config(
             "BANNED_NICKNAMES",
@@ -80,26 +200,8 @@ class HangoutConsumer(AsyncWebsocketConsumer):
             ] if nicknames else []
         )
 
-        self.bot_pattern = re.compile(
-            r'bot|crawl|spider|scrape|monitor|check|scan|test|'
-            r'wget|curl|python|java|http|lighthouse|pingdom|uptime|'
-            r'statuspage|newrelic|datadog|nagios|zabbix|prometheus|'
-            r'headless|phantom|selenium|go-http|okhttp|apache',
-            re.IGNORECASE
-        )
-
     def _get_real_client_ip(self):
-        headers = dict(self.scope.get('headers', []))
-        x_forwarded_for = headers.get(b'x-forwarded-for', b'').decode('utf-8')
-        
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0].strip()
-            return ip
-        
-        if self.scope.get('client'):
-            return self.scope['client'][0]
-        
-        return 'unknown'
+        return get_scope_client_ip(self.scope)
 
     def _get_user_agent(self):
         headers = dict(self.scope.get("headers", []))
@@ -107,40 +209,22 @@ class HangoutConsumer(AsyncWebsocketConsumer):
         return user_agent.lower()
 
     def _is_bot(self):
-        user_agent = self._get_user_agent()
-        
-        if not user_agent or len(user_agent) < 10:
-            return True
-
-        if not user_agent.startswith('mozilla/'):
-            return True
-        
-        if self.bot_pattern.search(user_agent):
-            return True
-        
-        return False
+        return user_agents.is_bot(self._get_user_agent())
 
     def _should_count_as_online(self):
         return not self._is_bot()
 
-    async def _handle_discord_message(self, data):
-        try:
-            message_data = json.loads(data)
-            await self.send(text_data=json.dumps({
-                'type': 'message',
-                'nickname': message_data['nickname'],
-                'content': message_data['content'],
-                'timestamp': message_data['timestamp'],
-                'is_highlighted': message_data.get('is_highlighted', False),
-                'from_discord': True
-            }))
-        except json.JSONDecodeError:
-            print(f"Invalid JSON from Discord")
-        except Exception as error:
-            print(f"Error processing Discord message: {error}")
+    async def _handle_discord_message(self, frame):
+        await self.send(text_data=frame)
 
     async def connect(self):
         self.user_id = self._get_real_client_ip()
+
+        if is_blocked_ip(self.user_id):
+            print(f"[Hangout] Blocked ip refused: {self.user_id}")
+            await self.close()
+            return
+
         user_agent = self._get_user_agent()
         is_bot = self._is_bot()
 
@@ -157,14 +241,13 @@ class HangoutConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
         self.broadcaster = await DiscordMessageBroadcaster.get_instance()
-        await self.broadcaster.subscribe(self._handle_discord_message)
+        await self.broadcaster.subscribe(self._handle_discord_message, on_overflow=self.close)
+
+        self.ticker = await OnlineCountTicker.get_instance(self.room_group_name)
 
         if not is_bot:
-            redis_client = get_async_redis_client()
-            try:
-                await self.online_tracker.mark_user_online(self.user_id, redis_client)
-            finally:
-                await redis_client.aclose()
+            await self.ticker.connected(self.user_id)
+            self.counted_online = True
 
         if not is_bot:
             self.heartbeat_task = asyncio.create_task(self.online_heartbeat())
@@ -180,25 +263,14 @@ class HangoutConsumer(AsyncWebsocketConsumer):
                 "is_highlighted": str(message.get("discord_user_id", "")) == self.highlight_user_id
             }))
 
-        redis_client = get_async_redis_client()
-        try:
-            online_count = await self.online_tracker.get_online_count(redis_client)
-        finally:
-            await redis_client.aclose()
-        
+        # everyone else hears about this connection on the ticker's next change
+        online_count = await self.ticker.current_count()
+
         await self.send(text_data=json.dumps({
             "type": "online_count",
             "count": online_count
         }))
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "online_count_update",
-                "count": online_count
-            }
-        )
-
         await self.send(text_data=json.dumps({
             "type": "system",
             "message": "connected to hangout"
@@ -217,6 +289,10 @@ class HangoutConsumer(AsyncWebsocketConsumer):
         if self.broadcaster:
             await self.broadcaster.unsubscribe(self._handle_discord_message)
 
+        if self.counted_online:
+            self.counted_online = False
+            await self.ticker.disconnected(self.user_id)
+
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
@@ -229,11 +305,7 @@ class HangoutConsumer(AsyncWebsocketConsumer):
 
             if message_type == "heartbeat":
                 if self._should_count_as_online():
-                    redis_client = get_async_redis_client()
-                    try:
-                        await self.online_tracker.heartbeat(self.user_id, redis_client)
-                    finally:
-                        await redis_client.aclose()
+                    await self.online_tracker.heartbeat(self.user_id, self.redis_client)
                 return
 
             if message_type == "message":
@@ -285,11 +357,7 @@ class HangoutConsumer(AsyncWebsocketConsumer):
                     self.room_group_name,
                     {
                         "type": "message_handler",
-                        "nickname": nickname,
-                        "content": content,
-                        "timestamp": message["timestamp"],
-                        "is_highlighted": False,
-                        "from_discord": False
+                        "frame": message_frame(nickname, content, message["timestamp"])
                     }
                 )
 
@@ -308,14 +376,7 @@ class HangoutConsumer(AsyncWebsocketConsumer):
             }))
 
     async def message_handler(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'message',
-            'nickname': event['nickname'],
-            'content': event['content'],
-            'timestamp': event['timestamp'],
-            'is_highlighted': event.get('is_highlighted', False),
-            'from_discord': event.get('from_discord', False)
-        }))
+        await self.send(text_data=event['frame'])
 
     async def online_count_update(self, event):
         await self.send(text_data=json.dumps({
@@ -328,11 +389,7 @@ class HangoutConsumer(AsyncWebsocketConsumer):
             while True:
                 await asyncio.sleep(30)
                 if self.user_id:
-                    redis_client = get_async_redis_client()
-                    try:
-                        await self.online_tracker.heartbeat(self.user_id, redis_client)
-                    finally:
-                        await redis_client.aclose()
+                    await self.online_tracker.heartbeat(self.user_id, self.redis_client)
         except asyncio.CancelledError:
             print(f"[Hangout] Heartbeat task cancelled for {self.user_id}")
         except Exception as error:
@@ -340,19 +397,15 @@ class HangoutConsumer(AsyncWebsocketConsumer):
 
     async def send_to_discord_via_redis(self, nickname, content, is_highlighted=False):
         try:
-            redis_client = get_async_redis_client()
-            try:
-                message_data = json.dumps({
-                    'nickname': nickname,
-                    'content': content,
-                    'is_highlighted': is_highlighted,
-                    'timestamp': timezone.now().isoformat()
-                })
-                
-                await redis_client.publish('web_to_discord', message_data)
-                print(f"Sent to Discord via Redis: {nickname}: {content}")
-            finally:
-                await redis_client.aclose()
+            message_data = json.dumps({
+                'nickname': nickname,
+                'content': content,
+                'is_highlighted': is_highlighted,
+                'timestamp': timezone.now().isoformat()
+            })
+
+            await self.redis_client.publish('web_to_discord', message_data)
+            print(f"Sent to Discord via Redis: {nickname}: {content}")
         except Exception as error:
             print(f"Error sending to Discord via Redis: {error}")
 
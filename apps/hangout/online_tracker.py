@@ -1,44 +1,173 @@
-from decouple import config
+import asyncio
+import time
+import uuid
+from collections import Counter
+from channels.layers import get_channel_layer
+from .redis_manager import get_async_redis_client
+
+
+# members are user ids scored by the unix time they were last seen
+ONLINE_KEY = "hangout:online"
+USER_TTL = 90
+
+LEADER_KEY = "hangout:online:ticker"
+TICK_INTERVAL = 5  # seconds between online count recomputes
+
+# one ZADD per heartbeat, expired members are trimmed in the same round-trip
+HEARTBEAT_SCRIPT = """
+redis.call("ZADD", KEYS[1], ARGV[1], ARGV[2])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", "(" .. (ARGV[1] - ARGV[3]))
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+return 1
+"""
+
+COUNT_SCRIPT = """
+local cutoff = ARGV[1] - ARGV[2]
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", "(" .. cutoff)
+return redis.call("ZCOUNT", KEYS[1], cutoff, "+inf")
+"""
+
+# renew the lease if we hold it, otherwise take it only when nobody does
+CLAIM_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+if redis.call("SET", KEYS[1], ARGV[1], "NX", "EX", ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+_scripts = {}
+
+
+def _script(redis_client, source):
+    if source not in _scripts:
+        _scripts[source] = redis_client.register_script(source)
+    return _scripts[source]
 
 
 class OnlineUserTracker:
-    ONLINE_SET_KEY = "online_users"
-    USER_TTL = 90
-    
-    def __init__(self):
-        self.redis_url = config("REDIS_URL", default="redis://localhost:6379")
-    
+    ONLINE_SET_KEY = ONLINE_KEY
+    USER_TTL = USER_TTL
+
     async def mark_user_online(self, user_id, redis_client):
         try:
-            await redis_client.sadd(self.ONLINE_SET_KEY, user_id)
-            await redis_client.setex(f"online_user:{user_id}", self.USER_TTL, "1")
+            await _script(redis_client, HEARTBEAT_SCRIPT)(
+                keys=[self.ONLINE_SET_KEY],
+                args=[time.time(), user_id, self.USER_TTL],
+                client=redis_client,
+            )
         except Exception as error:
             print(f"Error marking user online: {error}")
-    
+
     async def mark_user_offline(self, user_id, redis_client):
         try:
-            await redis_client.srem(self.ONLINE_SET_KEY, user_id)
-            await redis_client.delete(f"online_user:{user_id}")
+            await redis_client.zrem(self.ONLINE_SET_KEY, user_id)
         except Exception as error:
             print(f"Error marking user offline: {error}")
-    
+
     async def get_online_count(self, redis_client):
         try:
-            count = await redis_client.scard(self.ONLINE_SET_KEY)
-            return count
+            return await _script(redis_client, COUNT_SCRIPT)(
+                keys=[self.ONLINE_SET_KEY],
+                args=[time.time(), self.USER_TTL],
+                client=redis_client,
+            )
         except Exception as error:
             print(f"Error getting online count: {error}")
             return 0
-    
-    async def cleanup_expired_users(self, redis_client):
-        try:
-            all_users = await redis_client.smembers(self.ONLINE_SET_KEY)
-            for user_id in all_users:
-                exists = await redis_client.exists(f"online_user:{user_id}")
-                if not exists:
-                    await redis_client.srem(self.ONLINE_SET_KEY, user_id)
-        except Exception as e:
-            print(f"Error cleaning up expired users: {e}")
-    
+
     async def heartbeat(self, user_id, redis_client):
-        await self.mark_user_online(user_id, redis_client)
\ No newline at end of file
+        await self.mark_user_online(user_id, redis_client)
+
+
+class OnlineCountTicker:
+    """Per-process online count, refreshed on a fixed tick and broadcast by one elected process"""
+    _instance = None
+    _lock = asyncio.Lock()
+
+    def __init__(self, group_name, interval=TICK_INTERVAL):
+        self.group_name = group_name
+        self.interval = interval
+        self.token = uuid.uuid4().hex
+        self.tracker = OnlineUserTracker()
+        self.redis_client = get_async_redis_client()
+        self.channel_layer = get_channel_layer()
+        self.connections = Counter()
+        self.count = None
+        self.broadcast_count = None
+        self.task = None
+
+    @classmethod
+    async def get_instance(cls, group_name):
+        if cls._instance is None:
+            async with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls(group_name)
+                    cls._instance.start()
+        return cls._instance
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+            print("[Presence] Online count ticker started")
+
+    async def current_count(self):
+        """Last computed count, only the first caller in a process waits for redis"""
+        if self.count is None:
+            self.count = await self.tracker.get_online_count(self.redis_client)
+        return self.count
+
+    async def connected(self, user_id):
+        self.connections[user_id] += 1
+        await self.tracker.mark_user_online(user_id, self.redis_client)
+
+    async def disconnected(self, user_id):
+        """Drop one connection, the user goes offline with their last one in this process"""
+        self.connections[user_id] -= 1
+        if self.connections[user_id] > 0:
+            return
+
+        del self.connections[user_id]
+        await self.tracker.mark_user_offline(user_id, self.redis_client)
+
+    async def _is_leader(self):
+        try:
+            return bool(await _script(self.redis_client, CLAIM_SCRIPT)(
+                keys=[LEADER_KEY],
+                args=[self.token, self.interval * 3],
+                client=self.redis_client,
+            ))
+        except Exception as error:
+            print(f"[Presence] Error claiming ticker lease: {error}")
+            return False
+
+    async def tick(self):
+        self.count = await self.tracker.get_online_count(self.redis_client)
+
+        if not await self._is_leader():
+            # whoever leads next broadcasts its first count unconditionally
+            self.broadcast_count = None
+            return
+
+        if self.count != self.broadcast_count:
+            await self.channel_layer.group_send(
+                self.group_name,
+                {
+                    "type": "online_count_update",
+                    "count": self.count
+                }
+            )
+            self.broadcast_count = self.count
+
+    async def _run(self):
+        try:
+            while True:
+                try:
+                    await self.tick()
+                except Exception as error:
+                    print(f"[Presence] Error in ticker: {error}")
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            print("[Presence] Online count ticker cancelled")
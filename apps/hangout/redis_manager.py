@@ -1,13 +1,51 @@
+import asyncio
 import redis.asyncio as redis_async
 import redis as redis_sync
 from decouple import config
 import threading
+import time
+
+
+class InstrumentedBlockingConnectionPool(redis_async.BlockingConnectionPool):
+    """Async pool that waits for a free connection and counts how often it had to"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    async def get_connection(self, command_name, *keys, **options):
+        if self.can_get_connection():
+            return await super().get_connection(command_name, *keys, **options)
+
+        self.waits += 1
+        started = time.monotonic()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        except redis_sync.ConnectionError as error:
+            if isinstance(error.__cause__, asyncio.TimeoutError):
+                self.timeouts += 1
+            raise
+        finally:
+            self.wait_time += time.monotonic() - started
+
+    def stats(self):
+        return {
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+            "max_connections": self.max_connections,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "timeouts": self.timeouts,
+        }
 
 
 class RedisConnectionManager:
     _instance = None
     _lock = threading.Lock()
     _async_pool = None
+    _async_client = None
     _sync_pool = None
 
     def __new__(cls):
@@ -41,10 +79,12 @@ class RedisConnectionManager:
             redis_url = f"{redis_url}{separator}ssl_cert_reqs=none"
         
         
-        self._async_pool = redis_async.ConnectionPool.from_url(
+        # one pool per process shared by every socket, callers queue for a free connection
+        self._async_pool = InstrumentedBlockingConnectionPool.from_url(
             redis_url,
             decode_responses=True,
-            max_connections=4,
+            max_connections=config("REDIS_ASYNC_POOL_SIZE", default=20, cast=int),
+            timeout=config("REDIS_ASYNC_POOL_TIMEOUT", default=5.0, cast=float),
             socket_keepalive=True,
             socket_connect_timeout=5,
             retry_on_timeout=True
@@ -60,12 +100,16 @@ class RedisConnectionManager:
         )
 
     def get_async_client(self):
-        return redis_async.Redis(connection_pool=self._async_pool)
+        """The process-wide async client, created on first use"""
+        if self._async_client is None:
+            self._async_client = redis_async.Redis(connection_pool=self._async_pool)
+        return self._async_client
     
     def get_sync_client(self):
         return redis_sync.Redis(connection_pool=self._sync_pool)
     
     async def close_async_pool(self):
+        self._async_client = None
         if self._async_pool:
             await self._async_pool.disconnect()
     
@@ -82,4 +126,9 @@ def get_async_redis_client():
 
 
 def get_sync_redis_client():
-    return _redis_manager.get_sync_client()
\ No newline at end of file
+    return _redis_manager.get_sync_client()
+
+
+def get_async_pool_stats():
+    return _redis_manager._async_pool.stats()
+
@@ -0,0 +1,18 @@
+(function () {
+  'use strict';
+
+  // cached pages leave placeholders for widgets that go stale quickly
+  async function loadFragment(placeholder) {
+    try {
+      const response = await fetch(placeholder.dataset.fragmentUrl, {
+        headers: { "Accept": "text/html" },
+      });
+      if (!response.ok) return;
+      placeholder.outerHTML = await response.text();
+    } catch (e) {
+      console.error("Failed to load widget:", e);
+    }
+  }
+
+  document.querySelectorAll("[data-fragment-url]").forEach(loadFragment);
+})();
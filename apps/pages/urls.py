@@ -9,6 +9,7 @@ app_name = "pages"
 urlpatterns = [
     path("", views.home, name="home"),
     path("about/", views.about, name="about"),
+    path("widgets/discord-status/", views.discord_status, name="discord_status"),
 ]
 
 if not settings.DEBUG:
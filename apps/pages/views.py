@@ -1,10 +1,17 @@
 from django.shortcuts import render
 from django.http import Http404
+from django.views.decorators.cache import cache_control
+from apps.integrations.templatetags.integration_tags import discord_status_widget
 
 
 def home(request):
     return render(request, "pages/home.html", {"current_page": "home"})
 
+@cache_control(max_age=60)
+def discord_status(request):
+    """Discord status fragment for pages cached longer than the status stays true"""
+    return render(request, "integrations/discord_status.html", discord_status_widget())
+
 def about(request):
     raise Http404("Coming soon")
 
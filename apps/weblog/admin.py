@@ -1,10 +1,11 @@
 from django.contrib import admin
 from .models import Article, Comment
+from .search import search_article_ids
 
 
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
-    list_display = ["title", "status", "published_at", "created_at"]
+    list_display = ["title", "status", "published_at", "view_count", "created_at"]
     list_filter = ["status", "created_at", "published_at"]
     search_fields = ["title", "body"]
     prepopulated_fields = {"slug": ("title",)}
@@ -19,7 +20,7 @@ class ArticleAdmin(admin.ModelAdmin):
         }),
         ("Metadata", {
             "fields": (
-                "status",
+                "status", "word_count", "reading_time", "view_count"
             ),
         }),
         ("Timestamps", {
@@ -30,7 +31,19 @@ class ArticleAdmin(admin.ModelAdmin):
         }),
     )
 
-    readonly_fields = ["created_at", "updated_at"]
+    readonly_fields = [
+        "created_at", "updated_at", "word_count", "reading_time", "view_count"
+    ]
+
+    def get_search_results(self, request, queryset, search_term):
+        # use the full-text index instead of icontains scans when available
+        search_term = search_term.strip()
+        if search_term:
+            ids = search_article_ids(search_term, limit=500, published_only=False)
+            if ids is not None:
+                return queryset.filter(pk__in=ids), False
+
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Comment)
@@ -0,0 +1,124 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.http import HttpRequest
+from django.urls import resolve, reverse
+from .models import Article
+
+
+logger = logging.getLogger(__name__)
+
+BAKED_PAGE = "index.html"
+BAKEABLE_PATH = re.compile(r"^/weblog/(?:(?P<slug>[-\w]+)/)?$")
+
+FEED_FILES = {
+    "weblog:rss_feed": "index.xml",
+    "weblog:atom_feed": "index.xml",
+    "weblog:json_feed": "index.json",
+}
+
+
+def get_bake_root():
+    root = settings.WEBLOG_BAKE_ROOT
+    return Path(root) if root else None
+
+
+def baked_file_for(path):
+    """Map a request path to its baked page, None if it isn't bakeable"""
+    root = get_bake_root()
+    if root is None or not BAKEABLE_PATH.match(path):
+        return None
+    return root / path.strip("/") / BAKED_PAGE
+
+
+def _render(path):
+    """Run a weblog view for `path` the way a plain anonymous GET would"""
+    domain = Site.objects.get_current().domain
+
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {
+        "HTTP_HOST": domain,
+        "SERVER_NAME": domain,
+        "SERVER_PORT": "443",
+        "wsgi.url_scheme": "https",
+    }
+    # internal render, not a reader, so it must not count as a view
+    request._weblog_bake = True
+
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    return response
+
+
+def _write(target, content):
+    # write next to the target and swap it in so readers never see half a file
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=".bake-")
+    with os.fdopen(fd, "wb") as tmp:
+        tmp.write(content)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, target)
+
+
+def bake_path(path, filename=BAKED_PAGE):
+    root = get_bake_root()
+    response = _render(path)
+
+    if response.status_code != 200:
+        logger.warning(f"Not baking {path}: status {response.status_code}")
+        return False
+
+    _write(root / path.strip("/") / filename, response.content)
+    return True
+
+
+def unbake_path(path):
+    root = get_bake_root()
+    target = root / path.strip("/")
+    if target != root and target.is_dir():
+        shutil.rmtree(target, ignore_errors=True)
+
+
+def bake_article(slug):
+    return bake_path(reverse("weblog:article_page", args=[slug]))
+
+
+def bake_inventory():
+    return bake_path(reverse("weblog:article_inventory"))
+
+
+def bake_listings():
+    """Bake the first inventory page and every feed"""
+    bake_inventory()
+    for url_name, filename in FEED_FILES.items():
+        bake_path(reverse(url_name), filename)
+
+
+def bake_all(clean=False):
+    """Bake every published article plus listings, returns the article count"""
+    root = get_bake_root()
+    slugs = list(Article.published.values_list("slug", flat=True))
+
+    if clean and root.is_dir():
+        keep = set(slugs) | {
+            reverse(url_name).strip("/").split("/")[-1] for url_name in FEED_FILES
+        }
+        weblog_root = root / "weblog"
+        for entry in weblog_root.iterdir() if weblog_root.is_dir() else []:
+            if entry.is_dir() and entry.name not in keep:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    for slug in slugs:
+        bake_article(slug)
+    bake_listings()
+
+    return len(slugs)
@@ -0,0 +1,158 @@
+import hashlib
+from functools import wraps
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+
+ARTICLES = "articles"
+ARTICLE = "article"
+COMMENTS = "comments"
+VIEWS = "views"
+
+STAMP_KEY = "weblog:stamp:{scope}"
+VERSIONED_KEY = "weblog:{name}:{version}:{variant}"
+
+# entries are only replaced by a new version, the timeout just lets
+# superseded versions fall out of redis eventually
+VERSIONED_TIMEOUT = 60 * 60 * 24 * 7
+
+# stamps every other scope is derived from, these live until replaced
+SITE_SCOPES = frozenset({ARTICLES, COMMENTS, VIEWS})
+
+
+def article_scope(slug):
+    """Scope covering a single article's page"""
+    return f"{ARTICLE}:{slug}"
+
+
+def comments_scope(slug):
+    """Scope covering the comments of a single article"""
+    return f"{COMMENTS}:{slug}"
+
+
+def _latest_from_db(scope):
+    from .models import Article, Comment
+
+    if scope == ARTICLES:
+        latest = Article.objects.aggregate(latest=Max("updated_at"))["latest"]
+    elif scope == COMMENTS:
+        latest = Comment.objects.aggregate(latest=Max("created_at"))["latest"]
+    elif scope.startswith(f"{ARTICLE}:"):
+        slug = scope.split(":", 1)[1]
+        # unknown and unpublished articles have no stamp, so their pages can 404
+        return Article.published.filter(slug=slug).values_list(
+            "updated_at", flat=True
+        ).first()
+    elif scope.startswith(f"{COMMENTS}:"):
+        slug = scope.split(":", 1)[1]
+        latest = Comment.objects.filter(article__slug=slug).aggregate(
+            latest=Max("created_at")
+        )["latest"]
+    else:
+        latest = None  # view counts leave no timestamp behind
+
+    return latest or timezone.now()
+
+
+def get_stamp(scope):
+    """Return when content in `scope` last changed, seeding it from the db once
+
+    None for an article scope whose article isn't published.
+    """
+    key = STAMP_KEY.format(scope=scope)
+    stamp = cache.get(key)
+
+    if stamp is None:
+        stamp = _latest_from_db(scope)
+        if stamp is None:
+            return None
+        # any requested slug seeds a per-article stamp, so those expire and
+        # junk urls can't grow redis forever, reseeding reads the same db state
+        timeout = None if scope in SITE_SCOPES else VERSIONED_TIMEOUT
+        cache.add(key, stamp, timeout)
+
+    return stamp
+
+
+def bump_stamp(scope):
+    """Mark content in `scope` as changed now"""
+    cache.set(STAMP_KEY.format(scope=scope), timezone.now(), None)
+
+
+def clear_stamp(scope):
+    """Forget the stamp of `scope`, the next read seeds it from the db again"""
+    cache.delete(STAMP_KEY.format(scope=scope))
+
+
+def _get_stamps(scopes):
+    stamps = [get_stamp(scope) for scope in scopes]
+    return None if None in stamps else stamps
+
+
+def get_last_modified(*scopes):
+    stamps = _get_stamps(scopes)
+    return max(stamps) if stamps else None
+
+
+def get_etag(*scopes):
+    stamps = _get_stamps(scopes)
+    if not stamps:
+        return None
+    return "-".join(f"{stamp.timestamp():.6f}" for stamp in stamps)
+
+
+def get_version(*scopes):
+    return get_etag(*scopes)
+
+
+def versioned_key(name, *scopes, variant=""):
+    """Cache key that changes whenever content in `scopes` changes, None without a version"""
+    version = get_version(*scopes)
+    if version is None:
+        return None
+    variant = hashlib.md5(variant.encode("utf-8")).hexdigest()
+    return VERSIONED_KEY.format(name=name, version=version, variant=variant)
+
+
+def cache_response(*scopes, variant=None):
+    """Cache GET responses until content in `scopes` changes
+
+    A scope may also be a callable taking the view's keyword arguments.
+    `variant` maps a request to the part of its query string that varies the
+    response, or None to skip the cache; without it the query string is ignored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            view_scopes = [scope(**kwargs) if callable(scope) else scope for scope in scopes]
+
+            query = variant(request) if variant else ""
+            if query is None:
+                return view(request, *args, **kwargs)
+
+            key = versioned_key(
+                f"response:{view.__name__}", *view_scopes, variant=f"{request.path}?{query}"
+            )
+            if key is None:
+                return view(request, *args, **kwargs)
+
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                if hasattr(response, "render") and callable(response.render):
+                    response.add_post_render_callback(
+                        lambda rendered: cache.set(key, rendered, VERSIONED_TIMEOUT)
+                    )
+                else:
+                    cache.set(key, response, VERSIONED_TIMEOUT)
+
+            return response
+        return wrapper
+    return decorator
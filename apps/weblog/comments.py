@@ -0,0 +1,168 @@
+import json
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.hangout.redis_manager import get_sync_redis_client
+from .models import Article, Comment
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "weblog:comments:queue"
+DEAD_KEY = "weblog:comments:dead"  # entries that can never be written, kept for inspection
+THROTTLE_KEY = "weblog:comments:throttle:{ip}"
+
+NICKNAME_MAX_LENGTH = Comment._meta.get_field("nickname").max_length
+BODY_MAX_LENGTH = 1000
+DRAIN_BATCH_SIZE = 500
+
+
+class CommentError(ValueError):
+    pass
+
+
+def clean_comment(nickname, body):
+    """Normalise a submitted comment, raising CommentError when it is unusable"""
+    nickname = (nickname or "").strip()[:NICKNAME_MAX_LENGTH] or "anonymous"
+    body = (body or "").strip()
+
+    if not body:
+        raise CommentError("Comment can't be empty")
+    if len(body) > BODY_MAX_LENGTH:
+        raise CommentError(f"Comment is longer than {BODY_MAX_LENGTH} characters")
+
+    return nickname, body
+
+
+def allow_comment(ip):
+    """Count a submission against the per-ip window, False once it is used up"""
+    key = THROTTLE_KEY.format(ip=ip)
+    window = settings.WEBLOG_COMMENT_RATE_WINDOW
+
+    cache.add(key, 0, window)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # the window expired between add and incr
+        cache.set(key, 1, window)
+        count = 1
+
+    return count <= settings.WEBLOG_COMMENT_RATE_LIMIT
+
+
+def enqueue_comment(slug, nickname, body):
+    """Queue a cleaned comment for the next drain, no database access"""
+    get_sync_redis_client().rpush(QUEUE_KEY, json.dumps({
+        "slug": slug,
+        "nickname": nickname,
+        "body": body,
+        "created_at": timezone.now().isoformat(),
+    }))
+
+
+def _pop_batch(client, size):
+    pipe = client.pipeline(transaction=True)
+    pipe.lrange(QUEUE_KEY, 0, size - 1)
+    pipe.ltrim(QUEUE_KEY, size, -1)
+    items, _ = pipe.execute()
+    return items
+
+
+def _dead_letter(client, items, reason):
+    client.rpush(DEAD_KEY, *items)
+    logger.error(f"Dead-lettered {len(items)} queued comments: {reason}")
+
+
+def _parse_entry(item):
+    """Queued entry as a dict, None when it can't be a comment"""
+    try:
+        entry = json.loads(item)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or not isinstance(entry.get("slug"), str):
+        return None
+    return entry
+
+
+def _build_comment(entry, article):
+    created_at = entry.get("created_at")
+    return Comment(
+        article=article,
+        nickname=entry.get("nickname"),
+        body=entry.get("body"),
+        created_at=parse_datetime(created_at) if isinstance(created_at, str) else None,
+    )
+
+
+def _write_one_by_one(client, rows):
+    """Write rows separately after a batch failed, bad ones go to the dead letter list
+
+    Returns the comments written and whether the database itself failed, in
+    which case the unwritten rest went back in front of the queue.
+    """
+    written = []
+    for position, (item, comment) in enumerate(rows):
+        try:
+            with transaction.atomic():
+                Comment.objects.bulk_create([comment])
+        except (DataError, IntegrityError, ValueError, TypeError) as error:
+            _dead_letter(client, [item], error)
+        except Exception as error:
+            # not this row's fault, the next run retries it
+            client.lpush(QUEUE_KEY, *reversed([item for item, _ in rows[position:]]))
+            logger.error(f"Failed to write queued comments: {error}")
+            return written, True
+        else:
+            written.append(comment)
+    return written, False
+
+
+def drain_comment_queue(batch_size=DRAIN_BATCH_SIZE):
+    """Write queued comments in batches, returns the slugs that got new comments"""
+    client = get_sync_redis_client()
+    changed = set()
+
+    while True:
+        items = _pop_batch(client, batch_size)
+        if not items:
+            break
+
+        entries = []
+        for item in items:
+            entry = _parse_entry(item)
+            if entry is None:
+                _dead_letter(client, [item], f"malformed entry {item[:100]!r}")
+            else:
+                entries.append((item, entry))
+
+        articles = Article.published.only("id", "slug").in_bulk(
+            {entry["slug"] for _, entry in entries}, field_name="slug"
+        )
+        rows = []
+        for item, entry in entries:
+            if entry["slug"] not in articles:
+                continue  # unpublished or deleted meanwhile
+            try:
+                rows.append((item, _build_comment(entry, articles[entry["slug"]])))
+            except ValueError as error:
+                _dead_letter(client, [item], error)
+        comments = [comment for _, comment in rows]
+
+        stopped = False
+        try:
+            with transaction.atomic():
+                Comment.objects.bulk_create(comments)
+        except Exception as error:
+            # one bad row fails the whole insert, find it instead of retrying forever
+            logger.warning(f"Failed to write {len(comments)} queued comments at once: {error}")
+            comments, stopped = _write_one_by_one(client, rows)
+
+        changed.update(comment.article.slug for comment in comments)
+
+        if stopped or len(items) < batch_size:
+            break
+
+    return changed
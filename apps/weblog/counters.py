@@ -0,0 +1,120 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from redis.exceptions import RedisError, ResponseError
+from apps.hangout.redis_manager import get_sync_redis_client
+from .models import Article
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "weblog:views:pending"
+FLUSHING_KEY = "weblog:views:flushing"
+
+PUSH_INTERVAL = 1.0  # seconds a process tallies views before pushing them to redis
+FLUSH_CHUNK_SIZE = 500
+
+
+class ViewTally:
+    """Per-process view counts, pushed to a shared redis hash every interval in one round-trip"""
+
+    def __init__(self, interval=PUSH_INTERVAL):
+        self.interval = interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.push()
+            except Exception as error:
+                logger.error(f"Failed to push article views: {error}")
+
+    def start(self):
+        """Start the background pusher once per process, so quiet workers don't sit on views"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="view-tally-pusher", daemon=True
+                )
+                self._thread.start()
+
+    def add(self, slug):
+        self.start()
+        with self._lock:
+            self._counts[slug] += 1
+
+    def push(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+
+        if counts:
+            self._push(counts)
+
+    def _push(self, counts):
+        try:
+            pipe = get_sync_redis_client().pipeline(transaction=False)
+            for slug, count in counts.items():
+                pipe.hincrby(PENDING_KEY, slug, count)
+            pipe.execute()
+        except RedisError as error:
+            logger.warning(f"Dropped {sum(counts.values())} article views: {error}")
+
+
+view_tally = ViewTally()
+atexit.register(view_tally.push)
+
+
+def record_view(slug):
+    view_tally.add(slug)
+
+
+def counts_views(view):
+    """Count full and revalidated GETs of an article page, bakes excluded"""
+    @wraps(view)
+    def wrapper(request, *args, slug, **kwargs):
+        response = view(request, *args, slug=slug, **kwargs)
+        if getattr(request, "_weblog_bake", False):
+            return response
+        if request.method == "GET" and response.status_code in (200, 304):
+            record_view(slug)
+        return response
+    return wrapper
+
+
+def flush_view_counts():
+    """Add buffered views to Article.view_count, returns how many articles changed"""
+    client = get_sync_redis_client()
+
+    # a batch left over from a failed flush goes first, new views wait for the next run
+    if not client.exists(FLUSHING_KEY):
+        try:
+            client.renamenx(PENDING_KEY, FLUSHING_KEY)
+        except ResponseError:
+            return 0  # nothing pending
+
+    counts = {slug: int(count) for slug, count in client.hgetall(FLUSHING_KEY).items()}
+    slugs = list(counts)
+
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(slugs), FLUSH_CHUNK_SIZE):
+            chunk = slugs[start:start + FLUSH_CHUNK_SIZE]
+            updated += Article.objects.filter(slug__in=chunk).update(
+                view_count=F("view_count") + Case(
+                    *[When(slug=slug, then=Value(counts[slug])) for slug in chunk],
+                    default=Value(0),
+                )
+            )
+
+    client.delete(FLUSHING_KEY)
+    return updated
@@ -1,24 +1,138 @@
-from django.contrib.syndication.views import Feed
-from django.urls import reverse, reverse_lazy
+import gzip
+import json
+import logging
+from django.contrib.sites.models import Site
+from django.core.cache import cache as django_cache
+from django.urls import reverse
+from django.utils import feedgenerator
+from . import cache
 from .models import Article
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-class LatestArticlesFeed(Feed):
-    title = "cewko's weblog"
-    link = reverse_lazy("weblog:article_inventory")
-    description = "Latest articles from cewko's weblog"
 
-    def items(self):
-        return Article.published.all()[:5]
+logger = logging.getLogger(__name__)
 
-    def item_title(self, item):
-        return item.title
+FEED_TITLE = "cewko's weblog"
+FEED_DESCRIPTION = "Latest articles from cewko's weblog"
+FEED_SIZE = 5
+FEED_CACHE_KEY = "weblog:feed:{feed_format}"
 
-    def item_description(self, item):
-        return item.get_body_html()
+FEED_CONTENT_TYPES = {
+    "rss": "application/rss+xml; charset=utf-8",
+    "atom": "application/atom+xml; charset=utf-8",
+    "json": "application/feed+json; charset=utf-8",
+}
 
-    def item_link(self, item):
-        return reverse("weblog:article_page", args=[item.slug])
 
-    def item_pubdate(self, item):
-        return item.published_at
\ No newline at end of file
+def _absolute_url(domain, path):
+    return f"https://{domain}{path}"
+
+
+def _syndication_feed(feed_class, domain, feed_url_name, articles):
+    feed = feed_class(
+        title=FEED_TITLE,
+        link=_absolute_url(domain, reverse("weblog:article_inventory")),
+        description=FEED_DESCRIPTION,
+        feed_url=_absolute_url(domain, reverse(feed_url_name)),
+        language="en",
+    )
+
+    for article in articles:
+        link = _absolute_url(domain, reverse("weblog:article_page", args=[article.slug]))
+        feed.add_item(
+            title=article.title,
+            link=link,
+            description=article.body_html,
+            unique_id=link,
+            pubdate=article.published_at,
+            updateddate=article.updated_at,
+        )
+
+    return feed.writeString("utf-8").encode("utf-8")
+
+
+def _json_feed(domain, articles):
+    items = []
+    for article in articles:
+        link = _absolute_url(domain, reverse("weblog:article_page", args=[article.slug]))
+        items.append({
+            "id": link,
+            "url": link,
+            "title": article.title,
+            "content_html": article.body_html,
+            "date_published": article.published_at.isoformat(),
+            "date_modified": article.updated_at.isoformat(),
+        })
+
+    feed = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": FEED_TITLE,
+        "description": FEED_DESCRIPTION,
+        "home_page_url": _absolute_url(domain, reverse("weblog:article_inventory")),
+        "feed_url": _absolute_url(domain, reverse("weblog:json_feed")),
+        "language": "en",
+        "items": items,
+    }
+    return json.dumps(feed, ensure_ascii=False).encode("utf-8")
+
+
+def _encode_variants(content):
+    variants = {
+        "identity": content,
+        "gzip": gzip.compress(content, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=11)
+    return variants
+
+
+def build_feed_documents():
+    """Serialize every feed format once and store it with compressed variants"""
+    stamp = cache.get_stamp(cache.ARTICLES)
+    domain = Site.objects.get_current().domain
+    articles = list(
+        Article.published.only(
+            "title", "slug", "body_html", "published_at", "updated_at"
+        )[:FEED_SIZE]
+    )
+
+    documents = {
+        "rss": _syndication_feed(
+            feedgenerator.Rss201rev2Feed, domain, "weblog:rss_feed", articles
+        ),
+        "atom": _syndication_feed(
+            feedgenerator.Atom1Feed, domain, "weblog:atom_feed", articles
+        ),
+        "json": _json_feed(domain, articles),
+    }
+
+    built = {}
+    for feed_format, content in documents.items():
+        built[feed_format] = {"stamp": stamp, "variants": _encode_variants(content)}
+        django_cache.set(FEED_CACHE_KEY.format(feed_format=feed_format), built[feed_format], None)
+
+    logger.info(f"Built {len(documents)} feed documents with {len(articles)} articles")
+    return built
+
+
+def get_feed_document(feed_format):
+    """Return the stored feed, rebuilding it if articles changed since it was built"""
+    document = django_cache.get(FEED_CACHE_KEY.format(feed_format=feed_format))
+
+    if document is None or document["stamp"] != cache.get_stamp(cache.ARTICLES):
+        document = build_feed_documents()[feed_format]
+
+    return document
+
+
+def feed_etag(request, *args, **kwargs):
+    # weak, since the same document is served in several encodings
+    return f'W/"{cache.get_etag(cache.ARTICLES)}"'
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return cache.get_last_modified(cache.ARTICLES)
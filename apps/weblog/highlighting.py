@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from django.core.cache import cache
+from markdown.extensions import Extension
+from markdown.extensions.codehilite import CodeHilite, CodeHiliteExtension
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from markdown.preprocessors import Preprocessor
+
+
+logger = logging.getLogger(__name__)
+
+HIGHLIGHT_CACHE_KEY = "weblog:highlight:{digest}"
+HIGHLIGHT_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+MEMORY_CACHE_SIZE = 1024
+
+
+class HighlightCache:
+    """Highlighted code blocks keyed by content hash, LRU in memory with redis behind"""
+
+    def __init__(self, max_size=MEMORY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def digest(lang, code, style, config):
+        source = "\0".join([lang or "", style, repr(sorted(config.items())), code])
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def get_or_highlight(self, digest, highlight):
+        with self._lock:
+            html = self._entries.get(digest)
+            if html is not None:
+                self._entries.move_to_end(digest)
+                self.memory_hits += 1
+                return html
+
+        key = HIGHLIGHT_CACHE_KEY.format(digest=digest)
+        try:
+            html = cache.get(key)
+        except Exception as error:
+            logger.warning(f"Highlight cache unavailable: {error}")
+            html = None
+
+        if html is not None:
+            self.redis_hits += 1
+        else:
+            self.misses += 1
+            html = highlight()
+            try:
+                cache.set(key, html, HIGHLIGHT_CACHE_TIMEOUT)
+            except Exception as error:
+                logger.warning(f"Highlight cache unavailable: {error}")
+
+        with self._lock:
+            self._entries[digest] = html
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return html
+
+
+highlight_cache = HighlightCache()
+
+
+class CachedFencedBlockPreprocessor(Preprocessor):
+    """
+    Highlight plain ```lang fences through the highlight cache before the
+    stock fenced_code preprocessor runs, blocks with attributes or hl_lines
+    are left for fenced_code to handle
+    """
+
+    FENCED_BLOCK_RE = FencedBlockPreprocessor.FENCED_BLOCK_RE
+
+    def _codehilite_config(self):
+        for extension in self.md.registeredExtensions:
+            if isinstance(extension, CodeHiliteExtension):
+                return extension.getConfigs()
+        return None
+
+    def run(self, lines):
+        config = self._codehilite_config()
+        if not config or not config["use_pygments"]:
+            return lines
+
+        text = "\n".join(lines)
+        index = 0
+        while True:
+            match = self.FENCED_BLOCK_RE.search(text, index)
+            if not match:
+                break
+
+            if match.group("attrs") or match.group("hl_lines"):
+                index = match.end()
+                continue
+
+            lang = match.group("lang") or None
+            code = match.group("code")
+            local_config = config.copy()
+            style = local_config.pop("pygments_style", "default")
+
+            html = highlight_cache.get_or_highlight(
+                HighlightCache.digest(lang, code, style, local_config),
+                lambda: CodeHilite(code, lang=lang, style=style, **local_config).hilite(shebang=False)
+            )
+
+            placeholder = self.md.htmlStash.store(html)
+            text = f"{text[:match.start()]}\n{placeholder}\n{text[match.end():]}"
+            index = match.start() + 1 + len(placeholder)
+
+        return text.split("\n")
+
+
+class CachedHighlightExtension(Extension):
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        # run just before fenced_code_block (25)
+        md.preprocessors.register(CachedFencedBlockPreprocessor(md), "cached_fenced_code", 26)
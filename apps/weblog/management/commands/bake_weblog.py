@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.weblog.baking import bake_all, get_bake_root
+
+
+class Command(BaseCommand):
+    help = "bake published articles, the inventory and feeds into static files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clean",
+            action="store_true",
+            help="remove baked pages of articles that are no longer published"
+        )
+
+    def handle(self, *args, **options):
+        root = get_bake_root()
+        if root is None:
+            raise CommandError("set WEBLOG_BAKE_ROOT to enable baking")
+
+        count = bake_all(clean=options["clean"])
+        self.stdout.write(self.style.SUCCESS(f"{count} articles baked into {root}"))
@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from apps.weblog.models import Article
+from apps.weblog.rendering import render_batch
+from apps.weblog.signals import articles_changed_in_bulk
+
+
+class Command(BaseCommand):
+    help = "render article markdown and store HTML, word count and reading time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="re-render every article, not only the ones missing HTML"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="number of articles per worker batch and bulk update"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="number of render processes (1 renders in this process)"
+        )
+
+    def handle(self, *args, **options):
+        articles = Article.objects.order_by("pk")
+        if not options["all"]:
+            articles = articles.filter(body_html="")
+
+        total = articles.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS("no articles to render"))
+            return
+
+        self.total = total
+        self.done = 0
+        self.changed = 0
+        self.highlight_stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+        batches = self._batches(articles, options["batch_size"])
+        workers = max(options["workers"], 1)
+
+        if workers == 1:
+            for batch in batches:
+                self._save(render_batch(batch))
+        else:
+            self._render_in_pool(batches, workers)
+
+        if self.changed:
+            articles_changed_in_bulk()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.done} articles rendered ({self.changed} changed)"
+        ))
+        self.stdout.write(
+            "code blocks: {memory_hits} memory hits, {redis_hits} redis hits, "
+            "{misses} highlighted".format(**self.highlight_stats)
+        )
+
+    def _batches(self, articles, batch_size):
+        batch = []
+        for pk, body in articles.values_list("pk", "body").iterator(chunk_size=batch_size):
+            batch.append((pk, body))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _render_in_pool(self, batches, workers):
+        # keep a bounded number of batches in flight so memory stays flat
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for batch in batches:
+                pending.add(executor.submit(render_batch, batch))
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self._save(future.result())
+
+            for future in pending:
+                self._save(future.result())
+
+    def _save(self, result):
+        rendered, highlight_stats = result
+        for name in self.highlight_stats:
+            self.highlight_stats[name] += highlight_stats[name]
+
+        current = Article.objects.only(
+            "body_html", "word_count", "reading_time"
+        ).in_bulk([pk for pk, _ in rendered])
+        now = timezone.now()
+        changed = []
+
+        for pk, result in rendered:
+            article = current.get(pk)
+            if article is None or article.body_html == result.html:
+                continue
+
+            article.body_html = result.html
+            article.word_count = result.word_count
+            article.reading_time = result.reading_time
+            article.updated_at = now
+            changed.append(article)
+
+        if changed:
+            Article.objects.bulk_update(
+                changed, ["body_html", "word_count", "reading_time", "updated_at"]
+            )
+
+        self.done += len(rendered)
+        self.changed += len(changed)
+        self.stdout.write(f"[{self.done}/{self.total}] rendered")
@@ -0,0 +1,44 @@
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from .baking import BAKEABLE_PATH, baked_file_for, get_bake_root
+from .counters import record_view
+
+
+class BakedPageMiddleware:
+    """Serve baked weblog pages from disk before any view or query runs"""
+
+    def __init__(self, get_response):
+        if get_bake_root() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD") and not request.GET:
+            baked_file = baked_file_for(request.path)
+            if baked_file is not None:
+                try:
+                    stat = baked_file.stat()
+                except OSError:
+                    stat = None
+
+                if stat is not None:
+                    response = self._serve(request, baked_file, stat)
+                    slug = BAKEABLE_PATH.match(request.path).group("slug")
+                    if slug and request.method == "GET":
+                        record_view(slug)
+                    return response
+
+        return self.get_response(request)
+
+    def _serve(self, request, baked_file, stat):
+        if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        response = FileResponse(
+            baked_file.open("rb"), content_type="text/html; charset=utf-8"
+        )
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        response["Cache-Control"] = "no-cache"
+        return response
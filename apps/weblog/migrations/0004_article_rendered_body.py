@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+def render_existing_articles(apps, schema_editor):
+    from apps.weblog.rendering import render_article_body
+
+    Article = apps.get_model("weblog", "Article")
+    articles = list(Article.objects.only("id", "body"))
+
+    for article in articles:
+        rendered = render_article_body(article.body)
+        article.body_html = rendered.html
+        article.word_count = rendered.word_count
+        article.reading_time = rendered.reading_time
+
+    Article.objects.bulk_update(
+        articles, ["body_html", "word_count", "reading_time"], batch_size=100
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("weblog", "0003_article_weblog_arti_status_b0462f_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="body_html",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="reading_time",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="word_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(render_existing_articles, migrations.RunPython.noop),
+    ]
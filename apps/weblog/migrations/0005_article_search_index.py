@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:02
+
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE weblog_article ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX weblog_article_search_vector_idx
+    ON weblog_article USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS weblog_article_search_vector_idx",
+    "ALTER TABLE weblog_article DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE weblog_article_fts
+    USING fts5(title, body, tokenize = 'porter unicode61')
+    """,
+    """
+    INSERT INTO weblog_article_fts (rowid, title, body)
+    SELECT id, title, body FROM weblog_article
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS weblog_article_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("weblog", "0004_article_rendered_body"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weblog', '0007_comment_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='related_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -1,9 +1,7 @@
-import math
-import markdown
 from django.db import models
 from django.utils import timezone
 from django.utils.text import slugify
-from django.utils.html import strip_tags
+from .rendering import render_article_body
 
 
 class PublishedManager(models.Manager):
@@ -22,6 +20,11 @@ class Article(models.Model):
     title = models.CharField(max_length=256)
     slug = models.SlugField(max_length=256, unique=True)
     body = models.TextField(help_text="Markdown supported")
+    body_html = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    related_ids = models.JSONField(default=list, blank=True, editable=False)
     status = models.CharField(
         max_length=2,
         choices=Status,
@@ -34,6 +37,9 @@ class Article(models.Model):
     
     objects = models.Manager()
     published = PublishedManager()
+
+    # written only by the view count flush and the related articles index
+    TASK_FIELDS = frozenset({"view_count", "related_ids"})
     
     class Meta:
         ordering = ["-created_at"]
@@ -46,6 +52,14 @@ class Article(models.Model):
             models.Index(fields=["status", "-published_at"]),
         ]
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # remember the body as loaded so save() only re-renders on change
+        loaded = self.__dict__
+        self._rendered_body = loaded.get("body") if loaded.get("body_html") else None
+        self._loaded_position = (loaded.get("status"), loaded.get("published_at"))
+        self._loaded_slug = loaded.get("slug")
+
     def __str__(self):
         return self.title
     
@@ -57,31 +71,43 @@ class Article(models.Model):
         # set published_at when status changes to published
         if self.status == self.Status.PUBLISHED and not self.published_at:
             self.published_at = timezone.now()
+
+        # fields owned by background tasks, a stale copy must not clobber them,
+        # a deleted row falls through to django's usual insert
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and type(self)._base_manager.filter(pk=self.pk).exists()
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.attname not in self.TASK_FIELDS
+            ]
+
+        # re-render markdown only when the body changed since it was loaded
+        if "body" in self.__dict__ and self.body != self._rendered_body:
+            self.render_body()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields, "body_html", "word_count", "reading_time"
+                }
         
         super().save(*args, **kwargs)
+        self._loaded_position = (self.status, self.published_at)
+        self._loaded_slug = self.slug
     
-    def get_body_html(self):
-        """Convert markdown body to HTML"""
-        clean_body = self.body.strip()
-        return markdown.markdown(
-            clean_body,
-            extensions=['extra', 'codehilite', 'fenced_code', 'nl2br']
-        )
-    
-    def get_word_count(self):
-        """Calculate word count from body"""
-        html_content = markdown.markdown(self.body)
-        plain_text = strip_tags(html_content)
-        words = plain_text.split()
-
-        return len(words)
-    
-    def get_reading_time(self, words_per_minute=200):
-        """Estimate reading time in minutes"""
-        word_count = self.get_word_count()
-        reading_time = math.ceil(word_count / words_per_minute)
-
-        return max(reading_time, 2)
+    def render_body(self):
+        """Render markdown body and store HTML, word count and reading time"""
+        rendered = render_article_body(self.body)
+        self.body_html = rendered.html
+        self.word_count = rendered.word_count
+        self.reading_time = rendered.reading_time
+        self._rendered_body = self.body
 
 
 class Comment(models.Model):
@@ -92,7 +118,8 @@ class Comment(models.Model):
     )
     nickname = models.CharField(max_length=64)
     body = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add so queued comments keep the time they were submitted
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ["created_at"]
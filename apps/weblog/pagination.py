@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Q
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(article):
+    """Encode an article position as `<published_at micros>-<id>`"""
+    delta = article.published_at - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return f"{micros}-{article.pk}"
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into a (published_at, id) tuple, None if invalid"""
+    try:
+        micros, pk = cursor.split("-", 1)
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, items, number, has_newer, has_older):
+        self.items = items
+        self.number = number
+        self.has_newer = has_newer
+        self.has_older = has_older
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def newer_cursor(self):
+        return encode_cursor(self.items[0]) if self.has_newer else None
+
+    @property
+    def older_cursor(self):
+        return encode_cursor(self.items[-1]) if self.has_older else None
+
+
+def paginate_keyset(queryset, per_page, before=None, after=None, number=1):
+    """
+    Paginate articles newest first by (published_at, id) without OFFSET,
+    `before` walks towards older articles and `after` towards newer ones
+    """
+    before = decode_cursor(before) if before else None
+    after = decode_cursor(after) if after else None
+
+    if after:
+        published_at, pk = after
+        rows = list(
+            queryset.filter(
+                Q(published_at__gt=published_at)
+                | Q(published_at=published_at, pk__gt=pk)
+            ).order_by("published_at", "pk")[:per_page + 1]
+        )
+        has_newer = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        return KeysetPage(items, max(number, 2) if has_newer else 1, has_newer, bool(items))
+
+    if before:
+        published_at, pk = before
+        queryset = queryset.filter(
+            Q(published_at__lt=published_at)
+            | Q(published_at=published_at, pk__lt=pk)
+        )
+    else:
+        number = 1
+
+    rows = list(queryset.order_by("-published_at", "-pk")[:per_page + 1])
+    has_older = len(rows) > per_page
+    items = rows[:per_page]
+    return KeysetPage(items, max(number, 1), bool(before and items), has_older)
+
+
+def link_page_number(queryset, per_page, before=None, after=None):
+    """
+    Page number a pagination link carrying `before` or `after` points at,
+    None for cursors no link carries so they can't vary cached pages
+    """
+    cursor = before or after
+    position = decode_cursor(cursor)
+    if position is None:
+        return None
+
+    published_at, pk = position
+    article = queryset.filter(pk=pk, published_at=published_at).only("pk", "published_at").first()
+    if article is None or encode_cursor(article) != cursor:
+        return None
+
+    newer = queryset.filter(
+        Q(published_at__gt=published_at)
+        | Q(published_at=published_at, pk__gt=pk)
+    ).count()
+
+    if before:
+        # older links carry the last article of a full page
+        shown = newer + 1
+        return shown // per_page + 1 if shown % per_page == 0 else None
+
+    # newer links carry the first article of a page after the first
+    return newer // per_page if newer and newer % per_page == 0 else None
@@ -0,0 +1,245 @@
+import re
+from collections import Counter
+import numpy as np
+from scipy import sparse
+from django.core.cache import cache
+from django.utils.html import strip_tags
+from .models import Article
+
+
+RELATED_COUNT = 3
+TITLE_WEIGHT = 3  # title words count as if they appeared this many times
+TOKEN_RE = re.compile(r"[^\W\d_]{3,}")
+
+INDEX_KEY = "weblog:related:index"
+LOCK_KEY = "weblog:related:lock"
+LOCK_TIMEOUT = 5 * 60
+
+
+def _tokens(article):
+    text = f"{article.title} " * TITLE_WEIGHT + strip_tags(article.body_html)
+    return TOKEN_RE.findall(text.lower())
+
+
+def _normalize(matrix):
+    """Scale every row to unit length so dot products are cosine similarities"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms) @ matrix).tocsr()
+
+
+def _top_k(positions, scores, k=RELATED_COUNT):
+    """Best `k` (position, score) pairs, highest score first"""
+    keep = scores > 0
+    positions, scores = positions[keep], scores[keep]
+
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+        positions, scores = positions[best], scores[best]
+
+    order = np.argsort(-scores, kind="stable")
+    return positions[order], scores[order]
+
+
+class RelatedIndex:
+    """TF-IDF rows of published articles plus each article's nearest neighbours"""
+
+    def __init__(self, ids, vocabulary, idf, matrix):
+        self.ids = list(ids)
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix
+        self.neighbours = {}
+
+    @classmethod
+    def build(cls, articles):
+        if not articles:
+            return cls([], {}, np.zeros(0), sparse.csr_matrix((0, 0)))
+
+        vocabulary = {}
+        rows, cols, counts = [], [], []
+
+        for row, article in enumerate(articles):
+            for token, count in Counter(_tokens(article)).items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(token, len(vocabulary)))
+                counts.append(count)
+
+        shape = (len(articles), len(vocabulary))
+        tf = sparse.csr_matrix(
+            (np.log1p(np.array(counts, dtype=float)), (rows, cols)), shape=shape
+        )
+        df = np.bincount(np.array(cols, dtype=int), minlength=len(vocabulary))
+        idf = np.log((1 + len(articles)) / (1 + df)) + 1.0
+
+        index = cls(
+            [article.pk for article in articles],
+            vocabulary,
+            idf,
+            _normalize(tf @ sparse.diags(idf)),
+        )
+        index._rank_rows(range(len(articles)))
+        return index
+
+    def vectorize(self, article):
+        """TF-IDF row for an article using this index's vocabulary and idf"""
+        counts = Counter(
+            token for token in _tokens(article) if token in self.vocabulary
+        )
+        cols = np.array([self.vocabulary[token] for token in counts], dtype=int)
+        data = np.log1p(np.array(list(counts.values()), dtype=float)) * self.idf[cols]
+
+        row = sparse.csr_matrix(
+            (data, (np.zeros(len(cols), dtype=int), cols)),
+            shape=(1, len(self.vocabulary)),
+        )
+        return _normalize(row)
+
+    def related_ids(self, article_id):
+        return [pk for pk, _ in self.neighbours.get(article_id, [])]
+
+    def _rank_rows(self, rows):
+        """Recompute the neighbours of `rows` against every article"""
+        rows = list(rows)
+        if not rows:
+            return
+
+        similarity = (self.matrix[rows] @ self.matrix.T).tocsr()
+        for offset, row in enumerate(similarity):
+            positions = row.indices
+            scores = row.data.copy()
+            scores[positions == rows[offset]] = 0.0
+
+            best, best_scores = _top_k(positions, scores)
+            self.neighbours[self.ids[rows[offset]]] = [
+                (self.ids[position], float(score))
+                for position, score in zip(best, best_scores)
+            ]
+
+    def remove(self, article_id):
+        """Drop an article, returns the ids whose neighbours need a new ranking"""
+        if article_id not in self.ids:
+            return set()
+
+        position = self.ids.index(article_id)
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[position] = False
+
+        self.matrix = self.matrix[keep]
+        del self.ids[position]
+        self.neighbours.pop(article_id, None)
+
+        stale = {
+            pk for pk, neighbours in self.neighbours.items()
+            if any(neighbour == article_id for neighbour, _ in neighbours)
+        }
+        self._rank_rows(self.ids.index(pk) for pk in stale)
+        return stale
+
+    def update(self, article):
+        """Add or refresh one article, returns the ids whose neighbours changed"""
+        before = {pk: self.related_ids(pk) for pk in self.ids}
+        vector = self.vectorize(article)
+
+        if article.pk in self.ids:
+            position = self.ids.index(article.pk)
+            self.matrix = sparse.vstack(
+                [self.matrix[:position], vector, self.matrix[position + 1:]]
+            ).tocsr()
+        else:
+            position = len(self.ids)
+            self.ids.append(article.pk)
+            self.matrix = sparse.vstack([self.matrix, vector]).tocsr()
+
+        scores = (self.matrix @ vector.T).toarray().ravel()
+        scores[position] = 0.0
+
+        best, best_scores = _top_k(np.arange(len(scores)), scores)
+        self.neighbours[article.pk] = [
+            (self.ids[other], float(score)) for other, score in zip(best, best_scores)
+        ]
+
+        # only lists the changed article enters, leaves or moves within need work
+        stale = []
+        for other, score in enumerate(scores):
+            pk = self.ids[other]
+            if pk == article.pk:
+                continue
+
+            neighbours = self.neighbours.get(pk, [])
+            current = dict(neighbours)
+
+            if article.pk in current:
+                if score < current[article.pk]:
+                    stale.append(other)  # something else may now rank higher
+                    continue
+                current[article.pk] = float(score)
+            elif score > 0 and (
+                len(neighbours) < RELATED_COUNT or score > neighbours[-1][1]
+            ):
+                current[article.pk] = float(score)
+            else:
+                continue
+
+            ranked = sorted(current.items(), key=lambda item: -item[1])
+            self.neighbours[pk] = ranked[:RELATED_COUNT]
+
+        self._rank_rows(stale)
+
+        return {
+            pk for pk in self.ids if self.related_ids(pk) != before.get(pk, [])
+        }
+
+
+def _published_articles():
+    return list(
+        Article.published.only("id", "title", "body_html").order_by("pk")
+    )
+
+
+def _store(index, article_ids):
+    """Write the neighbour lists of `article_ids`, returns the ids that changed"""
+    current = dict(
+        Article.objects.filter(pk__in=article_ids).values_list("id", "related_ids")
+    )
+    changed = [
+        Article(pk=pk, related_ids=index.related_ids(pk))
+        for pk in article_ids
+        if pk in current and current[pk] != index.related_ids(pk)
+    ]
+    Article.objects.bulk_update(changed, ["related_ids"], batch_size=500)
+    return {article.pk for article in changed}
+
+
+def rebuild_related():
+    """Rebuild the whole index from scratch, returns the ids whose lists changed"""
+    index = RelatedIndex.build(_published_articles())
+    cache.set(INDEX_KEY, index, None)
+
+    Article.objects.exclude(status=Article.Status.PUBLISHED).exclude(
+        related_ids=[]
+    ).update(related_ids=[])
+
+    return _store(index, index.ids)
+
+
+def update_related(article_id):
+    """Refresh the index for one changed article, returns the ids whose lists changed"""
+    index = cache.get(INDEX_KEY)
+    if index is None:
+        return rebuild_related()
+
+    article = Article.published.only("id", "title", "body_html").filter(
+        pk=article_id
+    ).first()
+
+    if article is None:
+        stale = index.remove(article_id)
+        Article.objects.filter(pk=article_id).exclude(related_ids=[]).update(
+            related_ids=[]
+        )
+    else:
+        stale = index.update(article)
+
+    cache.set(INDEX_KEY, index, None)
+    return _store(index, stale)
@@ -0,0 +1,57 @@
+import math
+import threading
+from collections import namedtuple
+import markdown
+from django.utils.html import strip_tags
+from .highlighting import CachedHighlightExtension, highlight_cache
+
+
+MARKDOWN_EXTENSIONS = ["extra", "codehilite", "fenced_code", "nl2br"]
+WORDS_PER_MINUTE = 200
+MIN_READING_TIME = 2
+
+RenderedBody = namedtuple("RenderedBody", ["html", "word_count", "reading_time"])
+
+_local = threading.local()
+
+
+def get_renderer():
+    """Return this thread's Markdown instance, building it on first use"""
+    renderer = getattr(_local, "renderer", None)
+    if renderer is None:
+        renderer = markdown.Markdown(
+            extensions=[*MARKDOWN_EXTENSIONS, CachedHighlightExtension()]
+        )
+        _local.renderer = renderer
+    return renderer
+
+
+def render_markdown(text):
+    """Convert markdown text to HTML"""
+    renderer = get_renderer()
+    try:
+        return renderer.convert(text.strip())
+    finally:
+        # drop footnotes, abbreviations and stashed html before the next document
+        renderer.reset()
+
+
+def render_article_body(body):
+    """Render markdown body into HTML, plain-text word count and reading time"""
+    html = render_markdown(body)
+    word_count = len(strip_tags(html).split())
+    reading_time = max(math.ceil(word_count / WORDS_PER_MINUTE), MIN_READING_TIME)
+
+    return RenderedBody(html, word_count, reading_time)
+
+
+def get_highlight_stats():
+    """Hit and miss counts of the code highlight cache in this process"""
+    return highlight_cache.stats()
+
+
+def render_batch(batch):
+    """Render a list of (id, body) pairs, returning results and highlight stats"""
+    highlight_cache.reset_stats()
+    rendered = [(pk, render_article_body(body)) for pk, body in batch]
+    return rendered, highlight_cache.stats()
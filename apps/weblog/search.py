@@ -0,0 +1,93 @@
+import re
+from django.db import connection
+from django.db.models import Q
+
+
+FTS_TABLE = "weblog_article_fts"
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _sqlite_match_expression(query):
+    """Quote every term so user input can't inject FTS5 query syntax"""
+    terms = [term.replace('"', '""') for term in TOKEN_PATTERN.findall(query)]
+    if not terms:
+        return None
+
+    # prefix-match the last term so partial words still find something
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def search_article_ids(query, limit=50, published_only=True):
+    """
+    Return article ids matching `query` ordered by relevance,
+    or None if the database has no full-text index
+    """
+    status_clause = "AND a.status = 'PB'" if published_only else ""
+
+    if connection.vendor == "postgresql":
+        sql = f"""
+            SELECT a.id
+            FROM weblog_article a, websearch_to_tsquery('english', %s) query
+            WHERE a.search_vector @@ query {status_clause}
+            ORDER BY ts_rank(a.search_vector, query) DESC, a.published_at DESC
+            LIMIT %s
+        """
+        params = [query, limit]
+
+    elif connection.vendor == "sqlite":
+        match = _sqlite_match_expression(query)
+        if match is None:
+            return []
+
+        sql = f"""
+            SELECT a.id
+            FROM {FTS_TABLE} f
+            JOIN weblog_article a ON a.id = f.rowid
+            WHERE {FTS_TABLE} MATCH %s {status_clause}
+            ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), a.published_at DESC
+            LIMIT %s
+        """
+        params = [match, limit]
+
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_articles(query, limit=50):
+    """Return published articles matching `query` ordered by relevance"""
+    from .models import Article
+
+    ids = search_article_ids(query, limit=limit)
+    if ids is None:
+        return list(
+            Article.published.defer("body", "body_html")
+            .filter(Q(title__icontains=query) | Q(body__icontains=query))[:limit]
+        )
+
+    articles = Article.published.defer("body", "body_html").in_bulk(ids)
+    return [articles[pk] for pk in ids if pk in articles]
+
+
+def index_article(article):
+    """Sync one article into the SQLite FTS5 table (PostgreSQL does it itself)"""
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [article.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+            [article.pk, article.title, article.body]
+        )
+
+
+def unindex_article(article_id):
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [article_id])
@@ -0,0 +1,198 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import (
+    ARTICLES,
+    COMMENTS,
+    article_scope,
+    bump_stamp,
+    clear_stamp,
+    comments_scope,
+)
+from .models import Article, Comment
+from .search import index_article, unindex_article
+
+
+logger = logging.getLogger(__name__)
+
+
+def _bump_on_commit(*scopes):
+    """Bump once the write is visible, so a racing reader can't cache old rows as new"""
+    def bump():
+        for scope in scopes:
+            bump_stamp(scope)
+
+    transaction.on_commit(bump)
+
+
+def _schedule_feed_rebuild():
+    from .tasks import rebuild_feeds
+
+    try:
+        rebuild_feeds.delay()
+    except Exception as error:
+        # feeds rebuild themselves on the next request when stale
+        logger.error(f"Failed to schedule feed rebuild: {error}")
+
+
+def _schedule_related_update(article_id=None):
+    from .tasks import update_related_articles
+
+    def update():
+        try:
+            update_related_articles.delay(article_id)
+        except Exception as error:
+            # the nightly rebuild catches up
+            logger.error(f"Failed to schedule related articles update: {error}")
+
+    transaction.on_commit(update)
+
+
+def articles_changed_in_bulk():
+    """Invalidate everything derived from articles after bulk writes skipped signals"""
+    from core.sitemaps import refresh_sitemap
+
+    _bump_on_commit(ARTICLES)
+    transaction.on_commit(_bump_all_article_pages)
+    transaction.on_commit(_schedule_feed_rebuild)
+    transaction.on_commit(refresh_sitemap)
+    _schedule_related_update()
+
+
+def comments_changed_in_bulk(slugs):
+    """Invalidate comment sections after bulk writes skipped signals"""
+    _bump_on_commit(COMMENTS, *(comments_scope(slug) for slug in slugs))
+    _schedule_inventory_rebake()
+
+
+def _bump_all_article_pages():
+    published = Article.Status.PUBLISHED
+    for slug, status in Article.objects.values_list("slug", "status"):
+        if status == published:
+            bump_stamp(article_scope(slug))
+        else:
+            clear_stamp(article_scope(slug))
+
+
+def _schedule_article_page_bump(article, deleted=False):
+    """Invalidate the article's own page and the pages listing it as related"""
+    old_slug = article._loaded_slug
+    slug = article.slug
+    pk = article.pk
+    listed = article.status == Article.Status.PUBLISHED and not deleted
+
+    def bump():
+        if old_slug and old_slug != slug:
+            clear_stamp(article_scope(old_slug))
+        if listed:
+            bump_stamp(article_scope(slug))
+        else:
+            # with no stamp the validators give up and the page 404s
+            clear_stamp(article_scope(slug))
+
+        # related lists show titles, slugs and dates of other articles
+        for other_slug, related_ids in Article.published.values_list("slug", "related_ids"):
+            if pk in related_ids:
+                bump_stamp(article_scope(other_slug))
+
+    transaction.on_commit(bump)
+
+
+def _schedule_sitemap_refresh(article, created=False, deleted=False):
+    """Refresh only the sitemap shards an article change can affect"""
+    old_status, old_published_at = article._loaded_position
+    published = Article.Status.PUBLISHED
+    was_listed = old_status == published and not created
+    is_listed = article.status == published and not deleted
+
+    if not (was_listed or is_listed):
+        return
+
+    moments = [moment for moment in (old_published_at, article.published_at) if moment]
+    membership_changed = (
+        was_listed != is_listed or old_published_at != article.published_at
+    )
+
+    def refresh():
+        from core.sitemaps import refresh_sitemap
+
+        try:
+            refresh_sitemap(min(moments, default=None), membership_changed)
+        except Exception as error:
+            logger.error(f"Failed to refresh sitemap: {error}")
+
+    transaction.on_commit(refresh)
+
+
+def _schedule_rebake(article, deleted=False):
+    """Re-bake the pages an article appears on"""
+    from .baking import bake_article, bake_listings, get_bake_root, unbake_path
+
+    if get_bake_root() is None:
+        return
+
+    old_slug = article._loaded_slug
+    slug = article.slug
+    listed = article.status == Article.Status.PUBLISHED and not deleted
+
+    def rebake():
+        try:
+            if old_slug and old_slug != slug:
+                unbake_path(f"/weblog/{old_slug}/")
+            if listed:
+                bake_article(slug)
+            else:
+                unbake_path(f"/weblog/{slug}/")
+            bake_listings()
+        except Exception as error:
+            logger.error(f"Failed to re-bake weblog pages: {error}")
+
+    transaction.on_commit(rebake)
+
+
+def _schedule_inventory_rebake():
+    """Re-bake the inventory, whose comment counts are the only baked trace of comments"""
+    from .baking import bake_inventory, get_bake_root
+
+    if get_bake_root() is None:
+        return
+
+    def rebake():
+        try:
+            bake_inventory()
+        except Exception as error:
+            logger.error(f"Failed to re-bake weblog inventory: {error}")
+
+    transaction.on_commit(rebake)
+
+
+@receiver(post_save, sender=Article)
+def article_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    _bump_on_commit(ARTICLES)
+    _schedule_article_page_bump(instance)
+    transaction.on_commit(_schedule_feed_rebuild)
+    _schedule_sitemap_refresh(instance, created=created)
+    _schedule_rebake(instance)
+    _schedule_related_update(instance.pk)
+
+    if update_fields is None or {"title", "body"} & set(update_fields):
+        index_article(instance)
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    _bump_on_commit(ARTICLES)
+    _schedule_article_page_bump(instance, deleted=True)
+    transaction.on_commit(_schedule_feed_rebuild)
+    _schedule_sitemap_refresh(instance, deleted=True)
+    _schedule_rebake(instance, deleted=True)
+    _schedule_related_update(instance.pk)
+    unindex_article(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    _bump_on_commit(COMMENTS, comments_scope(instance.article.slug))
+    _schedule_inventory_rebake()
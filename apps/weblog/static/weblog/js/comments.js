@@ -0,0 +1,81 @@
+(function () {
+  'use strict';
+
+  // article pages are shared between readers, so the comment section
+  // and the CSRF token are loaded separately
+  const section = document.getElementById("comment-section");
+  const form = document.getElementById("comment-form");
+  const csrfInput = document.getElementById("comment-csrf");
+  const status = document.getElementById("comment-status");
+
+  // queued comments are written by a worker every few seconds
+  const RELOAD_DELAY = 6000;
+
+  async function loadComments() {
+    try {
+      const response = await fetch(section.dataset.commentsUrl, {
+        headers: { "Accept": "text/html" },
+      });
+      if (!response.ok) return;
+      section.innerHTML = await response.text();
+    } catch (e) {
+      console.error("Failed to load comments:", e);
+    }
+  }
+
+  async function fetchCsrfToken() {
+    const response = await fetch(form.dataset.csrfUrl, {
+      credentials: "same-origin",
+      headers: { "Accept": "application/json" },
+    });
+    const data = await response.json();
+    return data.token;
+  }
+
+  function setStatus(text) {
+    if (status) status.textContent = text;
+  }
+
+  if (section) loadComments();
+
+  if (!form || !csrfInput) return;
+
+  // posting needs a fetched CSRF token, so the form only appears with javascript
+  form.hidden = false;
+
+  let submitting = false;
+
+  form.addEventListener("submit", async (event) => {
+    event.preventDefault();
+    if (submitting) return;
+    submitting = true;
+
+    try {
+      if (!csrfInput.value) {
+        csrfInput.value = await fetchCsrfToken();
+      }
+
+      const response = await fetch(form.action, {
+        method: "POST",
+        credentials: "same-origin",
+        headers: { "Accept": "application/json" },
+        body: new FormData(form),
+      });
+      const data = await response.json();
+
+      if (!response.ok) {
+        setStatus(data.error || "Failed to send comment");
+        return;
+      }
+
+      form.reset();
+      setStatus("Comment sent, it will show up in a few seconds");
+      if (section) setTimeout(loadComments, RELOAD_DELAY);
+    } catch (e) {
+      console.error("Failed to send comment:", e);
+      setStatus("Failed to send comment");
+    } finally {
+      submitting = false;
+    }
+  });
+})();
@@ -0,0 +1,73 @@
+import logging
+from celery import shared_task
+from django.core.cache import cache
+from .baking import bake_article, bake_inventory, get_bake_root
+from .cache import ARTICLES, VIEWS, article_scope, bump_stamp
+from .comments import drain_comment_queue
+from .counters import flush_view_counts
+from .feeds import build_feed_documents
+from .models import Article
+from .related import LOCK_KEY, LOCK_TIMEOUT, rebuild_related, update_related
+from .signals import comments_changed_in_bulk
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rebuild_feeds():
+    documents = build_feed_documents()
+    return {"built": sorted(documents)}
+
+
+@shared_task
+def flush_article_views():
+    try:
+        updated = flush_view_counts()
+    except Exception as error:
+        # the batch stays in redis and is retried on the next run
+        logger.error(f"Failed to flush article views: {error}")
+        return {"error": str(error)}
+
+    # views only for slugs that no longer exist change nothing worth re-rendering
+    if updated:
+        bump_stamp(VIEWS)
+        if get_bake_root() is not None:
+            bake_inventory()
+
+    return {"updated": updated}
+
+
+@shared_task
+def write_queued_comments():
+    slugs = drain_comment_queue()
+    if slugs:
+        comments_changed_in_bulk(slugs)
+
+    return {"articles": len(slugs)}
+
+
+@shared_task(bind=True, max_retries=12)
+def update_related_articles(self, article_id=None):
+    # the index is loaded, changed and stored whole, so one writer at a time
+    if not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        raise self.retry(countdown=5)
+
+    try:
+        if article_id is None:
+            changed = rebuild_related()
+        else:
+            changed = update_related(article_id)
+    finally:
+        cache.delete(LOCK_KEY)
+
+    if changed:
+        bump_stamp(ARTICLES)
+        slugs = Article.published.filter(pk__in=changed).values_list("slug", flat=True)
+        for slug in slugs:
+            bump_stamp(article_scope(slug))
+        if get_bake_root() is not None:
+            for slug in slugs:
+                bake_article(slug)
+
+    return {"changed": len(changed)}
@@ -1,4 +1,5 @@
 from django import template
+from apps.weblog import cache
 from apps.weblog.models import Article
 
 
@@ -6,5 +7,13 @@ register = template.Library()
 
 @register.inclusion_tag("weblog/recent_articles_widget.html")
 def recent_articles_widget(limit=5):
-    articles = Article.published.all()[:limit]
-    return {"articles": articles}
\ No newline at end of file
+    articles = Article.published.only(
+        "title", "slug", "published_at", "reading_time"
+    )[:limit]
+    return {"articles": articles}
+
+
+@register.simple_tag
+def weblog_cache_version():
+    """Version for {% cache %} fragments that list articles"""
+    return cache.get_version(cache.ARTICLES)
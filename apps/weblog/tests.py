@@ -0,0 +1,452 @@
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from redis.exceptions import ResponseError
+from apps.weblog import baking, comments, counters, related, views
+from core import sitemaps
+from apps.weblog.models import Article, Comment
+from apps.weblog.pagination import encode_cursor, paginate_keyset
+
+
+class BakingTests(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(
+            title="Baked", slug="baked", body="body", status=Article.Status.PUBLISHED
+        )
+
+    def test_baking_an_article_records_no_view(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(WEBLOG_BAKE_ROOT=root):
+            with mock.patch.object(counters, "record_view") as record_view:
+                self.assertTrue(baking.bake_article(self.article.slug))
+
+        record_view.assert_not_called()
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.view_count, 0)
+
+    def test_reader_get_records_a_view(self):
+        with mock.patch.object(counters, "record_view") as record_view:
+            response = self.client.get(f"/weblog/{self.article.slug}/")
+
+        self.assertEqual(response.status_code, 200)
+        record_view.assert_called_once_with(self.article.slug)
+
+
+class ArticlePageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.first = Article.objects.create(
+            title="First", slug="first", body="apples pears",
+            status=Article.Status.PUBLISHED,
+        )
+        # nothing in common, so neither lists the other as related
+        self.second = Article.objects.create(
+            title="Second", slug="second", body="trains boats",
+            status=Article.Status.PUBLISHED,
+        )
+
+    def test_unknown_slug_with_validators_is_not_found(self):
+        etag = self.client.get("/weblog/first/")["ETag"]
+
+        with mock.patch.object(counters, "record_view") as record_view:
+            response = self.client.get("/weblog/junk/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 404)
+        record_view.assert_not_called()
+
+    def test_saving_an_article_keeps_other_pages_valid(self):
+        etag = self.client.get("/weblog/second/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.title = "First, edited"
+            self.first.save()
+
+        response = self.client.get("/weblog/second/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertContains(self.client.get("/weblog/first/"), "First, edited")
+
+    def test_unpublished_article_is_not_found(self):
+        self.client.get("/weblog/first/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.status = Article.Status.DRAFT
+            self.first.save()
+
+        self.assertEqual(self.client.get("/weblog/first/").status_code, 404)
+
+
+@override_settings(WEBLOG_INVENTORY_PAGE_SIZE=2)
+class InventoryVariantTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.articles = [
+            Article.objects.create(
+                title=f"Article {number}", slug=f"article-{number}", body="body",
+                status=Article.Status.PUBLISHED, published_at=now - timedelta(days=number),
+            )
+            for number in range(5)
+        ]
+
+    def _variant(self, **params):
+        return views.inventory_variant(RequestFactory().get("/weblog/", params))
+
+    def test_first_page_ignores_page_param(self):
+        self.assertEqual(self._variant(page="9"), "")
+
+    def test_real_links_are_cached(self):
+        older = encode_cursor(self.articles[1])
+        newer = encode_cursor(self.articles[2])
+
+        self.assertIsNotNone(self._variant(before=older, page="2"))
+        self.assertIsNotNone(self._variant(after=newer, page="1"))
+
+    def test_other_params_skip_the_cache(self):
+        older = encode_cursor(self.articles[1])
+
+        self.assertIsNone(self._variant(before=older, page="7"))
+        self.assertIsNone(self._variant(before=encode_cursor(self.articles[0]), page="2"))
+        self.assertIsNone(self._variant(before=f"0{older}", page="2"))
+        self.assertIsNone(self._variant(before="1-1", page="2"))
+        self.assertIsNone(self._variant(before="junk", page="2"))
+
+
+class PostCommentTests(TestCase):
+    def test_unpublished_article_is_not_found(self):
+        Article.objects.create(title="Draft", slug="draft", body="body")
+
+        with mock.patch("apps.weblog.views.enqueue_comment") as enqueue_comment:
+            response = self.client.post(
+                "/weblog/draft/comments/post/",
+                {"body": "hello"},
+                HTTP_ACCEPT="application/json",
+            )
+
+        self.assertEqual(response.status_code, 404)
+        enqueue_comment.assert_not_called()
+
+
+class DrainCommentQueueTests(TestCase):
+    def setUp(self):
+        Article.objects.create(
+            title="Open", slug="open", body="body", status=Article.Status.PUBLISHED
+        )
+        self.queue = []
+        self.redis = mock.Mock()
+        patchers = (
+            mock.patch.object(comments, "get_sync_redis_client", return_value=self.redis),
+            mock.patch.object(comments, "_pop_batch", side_effect=self._pop_batch),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _pop_batch(self, client, size):
+        batch, self.queue[:] = self.queue[:size], self.queue[size:]
+        return batch
+
+    def _queue(self, **entry):
+        self.queue.append(json.dumps(entry))
+
+    def _dead_lettered(self):
+        return [
+            item
+            for call in self.redis.rpush.call_args_list
+            if call.args[0] == comments.DEAD_KEY
+            for item in call.args[1:]
+        ]
+
+    def test_bad_row_is_dead_lettered_and_the_rest_written(self):
+        self._queue(slug="open", nickname="a", body="first", created_at="2024-01-01T00:00:00Z")
+        self._queue(slug="open", nickname="b", body="broken", created_at="not a date")
+        self._queue(slug="open", nickname="c", body="third", created_at="2024-01-01T00:00:01Z")
+
+        self.assertEqual(comments.drain_comment_queue(), {"open"})
+
+        self.assertQuerySetEqual(
+            Comment.objects.values_list("body", flat=True), ["first", "third"], ordered=False
+        )
+        self.assertEqual(len(self._dead_lettered()), 1)
+        self.redis.lpush.assert_not_called()
+
+    def test_entry_without_slug_is_dead_lettered(self):
+        self._queue(nickname="a", body="lost", created_at="2024-01-01T00:00:00Z")
+        self._queue(slug="open", nickname="b", body="kept", created_at="2024-01-01T00:00:00Z")
+
+        self.assertEqual(comments.drain_comment_queue(), {"open"})
+
+        self.assertEqual(Comment.objects.get().body, "kept")
+        self.assertEqual(len(self._dead_lettered()), 1)
+
+
+class ArticleSaveTests(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(title="Saved", slug="saved", body="body")
+
+    def test_save_keeps_task_fields_written_meanwhile(self):
+        Article.objects.filter(pk=self.article.pk).update(view_count=7, related_ids=[1])
+
+        self.article.title = "Renamed"
+        self.article.save()
+
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.title, "Renamed")
+        self.assertEqual(self.article.view_count, 7)
+        self.assertEqual(self.article.related_ids, [1])
+
+    def test_save_after_delete_inserts_the_row_again(self):
+        Article.objects.filter(pk=self.article.pk).delete()
+
+        self.article.save()
+
+        self.assertTrue(Article.objects.filter(pk=self.article.pk).exists())
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for number in range(3):
+            Article.objects.create(
+                title=f"Article {number}", slug=f"article-{number}", body="body",
+                status=Article.Status.PUBLISHED,
+            )
+
+    def test_evicted_root_is_rebuilt(self):
+        self.assertEqual(self.client.get("/sitemap.xml/").status_code, 200)
+        cache.delete(sitemaps.SITEMAP_KEY.format(name="root"))
+
+        response = self.client.get("/sitemap.xml/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"article-2", response.content)
+
+    @override_settings(SITEMAP_SHARD_SIZE=2)
+    def test_evicted_shard_is_rebuilt(self):
+        self.client.get("/sitemap.xml/")
+        cache.delete(sitemaps.SITEMAP_KEY.format(name=2))
+
+        response = self.client.get("/sitemap-2.xml/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"article-2", response.content)
+
+    @override_settings(SITEMAP_SHARD_SIZE=2)
+    def test_unknown_shard_is_not_found(self):
+        self.client.get("/sitemap.xml/")
+
+        with mock.patch.object(sitemaps, "refresh_sitemap") as refresh_sitemap:
+            response = self.client.get("/sitemap-9.xml/")
+
+        self.assertEqual(response.status_code, 404)
+        refresh_sitemap.assert_not_called()
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        # two articles share a timestamp so the id breaks the tie
+        moments = [now, now - timedelta(days=1), now - timedelta(days=1)] + [
+            now - timedelta(days=days) for days in range(2, 5)
+        ]
+        for number, published_at in enumerate(moments):
+            Article.objects.create(
+                title=f"Article {number}", slug=f"article-{number}", body="body",
+                status=Article.Status.PUBLISHED, published_at=published_at,
+            )
+        self.newest_first = list(
+            Article.published.order_by("-published_at", "-pk").values_list("slug", flat=True)
+        )
+
+    def _slugs(self, page):
+        return [article.slug for article in page]
+
+    def test_walking_older_then_newer_visits_every_page_once(self):
+        page = paginate_keyset(Article.published, 4)
+        pages = [page]
+        while page.has_older:
+            page = paginate_keyset(
+                Article.published, 4, before=page.older_cursor, number=page.number + 1
+            )
+            pages.append(page)
+
+        self.assertEqual(
+            [slug for page in pages for slug in self._slugs(page)], self.newest_first
+        )
+        self.assertEqual([page.number for page in pages], [1, 2])
+        self.assertFalse(pages[0].has_newer)
+
+        back = paginate_keyset(
+            Article.published, 4, after=pages[-1].newer_cursor, number=pages[-1].number - 1
+        )
+        self.assertEqual(self._slugs(back), self.newest_first[:4])
+        self.assertEqual(back.number, 1)
+        self.assertFalse(back.has_newer)
+
+    def test_ties_are_split_by_id(self):
+        first = paginate_keyset(Article.published, 2)
+        second = paginate_keyset(Article.published, 2, before=first.older_cursor, number=2)
+
+        self.assertEqual(self._slugs(first) + self._slugs(second), self.newest_first[:4])
+
+    def test_invalid_cursor_starts_over(self):
+        page = paginate_keyset(Article.published, 4, before="junk", number=3)
+
+        self.assertEqual(self._slugs(page), self.newest_first[:4])
+        self.assertEqual(page.number, 1)
+
+
+class RelatedIndexTests(TestCase):
+    BODIES = [
+        "python django templates python",
+        "python numpy arrays numpy numpy",
+        "django templates caching caching",
+        "numpy arrays sparse matrices",
+        "caching redis redis keys",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.articles = [
+            Article.objects.create(
+                title=f"Article {number}", slug=f"article-{number}", body=body,
+                status=Article.Status.PUBLISHED,
+            )
+            for number, body in enumerate(self.BODIES)
+        ]
+        related.rebuild_related()
+
+    def _assert_matches_brute_force(self):
+        index = cache.get(related.INDEX_KEY)
+        similarity = (index.matrix @ index.matrix.T).toarray()
+        np.fill_diagonal(similarity, 0.0)
+
+        for row, pk in enumerate(index.ids):
+            # scores rather than ids, equal scores may rank in either order
+            best = sorted(similarity[row][similarity[row] > 0], reverse=True)
+            scores = [score for _, score in index.neighbours[pk]]
+            np.testing.assert_allclose(scores, best[:related.RELATED_COUNT])
+            self.assertEqual(Article.objects.get(pk=pk).related_ids, index.related_ids(pk))
+
+    def test_update_matches_brute_force_ranking(self):
+        article = self.articles[4]
+        article.body = "python numpy arrays sparse sparse"
+        article.save()
+
+        related.update_related(article.pk)
+
+        self._assert_matches_brute_force()
+
+    def test_removal_matches_brute_force_ranking(self):
+        article = self.articles[2]
+        article.status = Article.Status.DRAFT
+        article.save()
+
+        related.update_related(article.pk)
+
+        self._assert_matches_brute_force()
+        article.refresh_from_db()
+        self.assertEqual(article.related_ids, [])
+
+
+class SitemapShardingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.articles = [
+            Article.objects.create(
+                title=f"Article {number}", slug=f"article-{number}", body="body",
+                status=Article.Status.PUBLISHED, published_at=now - timedelta(days=10 - number),
+            )
+            for number in range(4)
+        ]
+
+    @override_settings(SITEMAP_SHARD_SIZE=2)
+    def test_articles_are_split_into_shards_oldest_first(self):
+        root = self.client.get("/sitemap.xml/")
+
+        self.assertIn(b"sitemap-2.xml", root.content)
+        self.assertNotIn(b"sitemap-3.xml", root.content)
+        shard = self.client.get("/sitemap-1.xml/").content
+        self.assertIn(b"article-0", shard)
+        self.assertIn(b"article-1", shard)
+        self.assertNotIn(b"article-2", shard)
+
+    @override_settings(SITEMAP_SHARD_SIZE=2)
+    def test_refresh_adds_and_removes_shards(self):
+        sitemaps.refresh_sitemap()
+        article = Article.objects.create(
+            title="Newest", slug="newest", body="body", status=Article.Status.PUBLISHED
+        )
+
+        sitemaps.refresh_sitemap(article.published_at, membership_changed=True)
+
+        self.assertIn(b"sitemap-3.xml", self.client.get("/sitemap.xml/").content)
+        self.assertIn(b"newest", self.client.get("/sitemap-3.xml/").content)
+
+        Article.objects.filter(pk=article.pk).delete()
+        sitemaps.refresh_sitemap(article.published_at, membership_changed=True)
+
+        self.assertNotIn(b"sitemap-3.xml", self.client.get("/sitemap.xml/").content)
+        self.assertEqual(self.client.get("/sitemap-3.xml/").status_code, 404)
+
+
+class FakeViewsRedis:
+    """Just the hash and key commands the view count flush uses"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def renamenx(self, source, destination):
+        if source not in self.hashes:
+            raise ResponseError("no such key")
+        if destination in self.hashes:
+            return False
+        self.hashes[destination] = self.hashes.pop(source)
+        return True
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+
+class FlushViewCountsTests(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(
+            title="Read", slug="read", body="body", status=Article.Status.PUBLISHED
+        )
+        self.redis = FakeViewsRedis()
+        patcher = mock.patch.object(counters, "get_sync_redis_client", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pending_views_are_added(self):
+        self.redis.hashes[counters.PENDING_KEY] = {"read": "3", "gone": "2"}
+
+        self.assertEqual(counters.flush_view_counts(), 1)
+
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.view_count, 3)
+        self.assertEqual(self.redis.hashes, {})
+
+    def test_leftover_batch_goes_first(self):
+        self.redis.hashes[counters.FLUSHING_KEY] = {"read": "2"}
+        self.redis.hashes[counters.PENDING_KEY] = {"read": "5"}
+
+        counters.flush_view_counts()
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.view_count, 2)
+
+        counters.flush_view_counts()
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.view_count, 7)
+
+    def test_nothing_pending(self):
+        self.assertEqual(counters.flush_view_counts(), 0)
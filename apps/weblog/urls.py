@@ -1,12 +1,17 @@
 from django.urls import path
 from . import views
-from .feeds import LatestArticlesFeed
 
 
 app_name = "weblog"
 
 urlpatterns = [
     path("", views.article_inventory, name="article_inventory"),
-    path("rss/", LatestArticlesFeed(), name="rss_feed"),
-    path("<slug:slug>/", views.article_page, name="article_page")
+    path("rss/", views.article_feed, {"feed_format": "rss"}, name="rss_feed"),
+    path("atom/", views.article_feed, {"feed_format": "atom"}, name="atom_feed"),
+    path("json/", views.article_feed, {"feed_format": "json"}, name="json_feed"),
+    path("search/", views.article_search, name="article_search"),
+    path("csrf/", views.csrf_token, name="csrf_token"),
+    path("<slug:slug>/", views.article_page, name="article_page"),
+    path("<slug:slug>/comments/", views.article_comments, name="article_comments"),
+    path("<slug:slug>/comments/post/", views.post_comment, name="post_comment")
 ]
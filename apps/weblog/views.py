@@ -1,43 +1,228 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
+import logging
+import re
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render, get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition, require_POST, require_safe
+from redis.exceptions import RedisError
+from apps.analytics.client_ip import get_client_ip
+from apps.weblog import cache
+from apps.weblog.comments import (
+    CommentError,
+    allow_comment,
+    clean_comment,
+    enqueue_comment,
+)
+from apps.weblog.counters import counts_views
+from apps.weblog.feeds import (
+    FEED_CONTENT_TYPES,
+    feed_etag,
+    feed_last_modified,
+    get_feed_document,
+)
 from apps.weblog.models import Article, Comment
+from apps.weblog.pagination import link_page_number, paginate_keyset
+from apps.weblog.search import search_articles
 
 
-@cache_page(60 * 5)
+logger = logging.getLogger(__name__)
+
+ACCEPTS_BROTLI = re.compile(r"\bbr\b")
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+
+INVENTORY_SCOPES = (cache.ARTICLES, cache.COMMENTS, cache.VIEWS)
+
+
+def inventory_etag(request):
+    return cache.get_etag(*INVENTORY_SCOPES)
+
+
+def inventory_last_modified(request):
+    return cache.get_last_modified(*INVENTORY_SCOPES)
+
+
+def article_etag(request, slug):
+    return cache.get_etag(cache.article_scope(slug))
+
+
+def article_last_modified(request, slug):
+    return cache.get_last_modified(cache.article_scope(slug))
+
+
+def comments_etag(request, slug):
+    return cache.get_etag(cache.comments_scope(slug))
+
+
+def comments_last_modified(request, slug):
+    return cache.get_last_modified(cache.comments_scope(slug))
+
+
+def inventory_variant(request):
+    """Cache variant of an inventory link, None for params no link carries"""
+    before = request.GET.get("before")
+    after = request.GET.get("after")
+    if not before and not after:
+        return ""  # the first page whatever `page` says
+    if before and after:
+        return None
+
+    number = link_page_number(
+        Article.published, settings.WEBLOG_INVENTORY_PAGE_SIZE, before=before, after=after
+    )
+    if number is None or request.GET.get("page") != str(number):
+        return None
+    return f"before={before or ''}&after={after or ''}&page={number}"
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=inventory_etag, last_modified_func=inventory_last_modified)
+@cache.cache_response(*INVENTORY_SCOPES, variant=inventory_variant)
 def article_inventory(request):
-    articles = Article.published.all()
+    comment_counts = (
+        Comment.objects.filter(article=OuterRef("pk"))
+        .order_by()
+        .values("article")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    articles = (
+        Article.published
+        .defer("body", "body_html")
+        .annotate(comment_count=Coalesce(Subquery(comment_counts), 0))
+    )
+
+    try:
+        number = int(request.GET.get("page", 1))
+    except ValueError:
+        number = 1
+
+    page = paginate_keyset(
+        articles,
+        settings.WEBLOG_INVENTORY_PAGE_SIZE,
+        before=request.GET.get("before"),
+        after=request.GET.get("after"),
+        number=number,
+    )
+
     return render(
         request, "weblog/article_inventory.html", {
-            "articles": articles,
-            "current_page": "weblog"
+            "articles": page.items,
+            "page": page,
+            "current_page": "weblog",
+            "defer_live_widgets": True
         }
     )
 
 
+def article_search(request):
+    query = request.GET.get("q", "").strip()[:200]
+    articles = search_articles(query) if query else []
+
+    return render(request, "weblog/article_search.html", {
+        "articles": articles,
+        "query": query,
+        "current_page": "weblog"
+    })
+
+
+@cache_control(no_cache=True)
+@require_safe
+@counts_views
+@condition(etag_func=article_etag, last_modified_func=article_last_modified)
+@cache.cache_response(cache.article_scope)
 def article_page(request, slug):
-    article = get_object_or_404(
-        Article.published.prefetch_related("comments"), 
-        slug=slug
-    )
-    comments = article.comments.all()
-
-    if request.method == "POST":
-        nickname = request.POST.get("nickname", "anonymous")[:64].strip()
-        if not nickname:
-            nickname = "anonymous"
-        
-        body = request.POST.get("body", "").strip()
-
-        if body:
-            Comment.objects.create(
-                article=article,
-                nickname=nickname,
-                body=body
-            )
-            return redirect('weblog:article_page', slug=slug)
+    article = get_object_or_404(Article.published, slug=slug)
+
+    related = Article.published.only("title", "slug", "published_at").in_bulk(
+        article.related_ids
+    )
 
     return render(request, "weblog/article_page.html", {
         "article": article,
+        "related_articles": [related[pk] for pk in article.related_ids if pk in related],
+        "current_page": "weblog",
+        # the page is cached until the article changes, live widgets load separately
+        "defer_live_widgets": True
+    })
+
+
+@require_POST
+def post_comment(request, slug):
+    """Validate a comment and queue it, a worker writes it to the database"""
+    if not allow_comment(get_client_ip(request)):
+        response = JsonResponse({"error": "Too many comments, slow down"}, status=429)
+        response["Retry-After"] = str(settings.WEBLOG_COMMENT_RATE_WINDOW)
+        return response
+
+    try:
+        nickname, body = clean_comment(
+            request.POST.get("nickname"), request.POST.get("body")
+        )
+    except CommentError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    # the queue drain would silently drop comments on missing or draft articles
+    if not Article.published.filter(slug=slug).exists():
+        return JsonResponse({"error": "No article matches the given query."}, status=404)
+
+    try:
+        enqueue_comment(slug, nickname, body)
+    except RedisError as error:
+        logger.error(f"Failed to queue comment: {error}")
+        return JsonResponse({"error": "Comments are unavailable right now"}, status=503)
+
+    return JsonResponse({"queued": True}, status=202)
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=comments_etag, last_modified_func=comments_last_modified)
+@cache.cache_response(cache.comments_scope)
+def article_comments(request, slug):
+    """Comment section fragment, loaded separately so article pages stay shared"""
+    comments = list(
+        Comment.objects.filter(
+            article__slug=slug, article__status=Article.Status.PUBLISHED
+        )
+    )
+
+    if not comments and not Article.published.filter(slug=slug).exists():
+        raise Http404("No article matches the given query.")
+
+    return render(request, "weblog/article_comments.html", {
         "comments": comments,
-        "current_page": "weblog"
-    })
\ No newline at end of file
+    })
+
+
+@never_cache
+def csrf_token(request):
+    """Hand out a CSRF token to pages rendered without one (baked or cached)"""
+    return JsonResponse({"token": get_token(request)})
+
+
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def article_feed(request, feed_format):
+    variants = get_feed_document(feed_format)["variants"]
+    accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+    if "br" in variants and ACCEPTS_BROTLI.search(accept_encoding):
+        encoding = "br"
+    elif ACCEPTS_GZIP.search(accept_encoding):
+        encoding = "gzip"
+    else:
+        encoding = "identity"
+
+    response = HttpResponse(
+        variants[encoding], content_type=FEED_CONTENT_TYPES[feed_format]
+    )
+    if encoding != "identity":
+        response["Content-Encoding"] = encoding
+    response["Content-Length"] = len(variants[encoding])
+    patch_vary_headers(response, ["Accept-Encoding"])
+
+    return response
\ No newline at end of file
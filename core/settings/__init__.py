@@ -6,5 +6,7 @@ if environment == 'production':
     from .production import *
 elif environment == 'development':
     from .development import *
+elif environment == 'test':
+    from .test import *
 else:
     from .base import *
\ No newline at end of file
@@ -35,6 +35,7 @@ MIDDLEWARE = [
     "django.contrib.sessions.middleware.SessionMiddleware",
     "apps.analytics.middleware.AnalyticsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "apps.weblog.middleware.BakedPageMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -91,6 +92,20 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Sitemaps
 SITE_ID = 1
+SITEMAP_SHARD_SIZE = 50000  # urls per sitemap file before splitting into an index
+
+# Analytics
+ANALYTICS_RAW_RETENTION_DAYS = config("ANALYTICS_RAW_RETENTION_DAYS", default=90, cast=int)
+ANALYTICS_BOT_PATTERNS_FILE = config("ANALYTICS_BOT_PATTERNS_FILE", default="")  # one regex per line
+ANALYTICS_BLOCKLIST_FILE = config("ANALYTICS_BLOCKLIST_FILE", default="")  # one network per line
+# salts the visitor hashes kept after raw visits are pruned, changing it makes everyone new again
+ANALYTICS_VISITOR_SALT = config("ANALYTICS_VISITOR_SALT", default=SECRET_KEY)
+
+# Weblog
+WEBLOG_INVENTORY_PAGE_SIZE = 20
+WEBLOG_BAKE_ROOT = config("WEBLOG_BAKE_ROOT", default="")  # empty disables baking
+WEBLOG_COMMENT_RATE_LIMIT = 5  # comments per ip per window
+WEBLOG_COMMENT_RATE_WINDOW = 60  # seconds
 
 
 # Celery Configuration
@@ -105,6 +120,34 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_RESULT_EXPIRES = 3600
 
 CELERY_BEAT_SCHEDULE = {
+    "ingest-visits": {
+        "task": "apps.analytics.tasks.ingest_visits",
+        "schedule": 10.0,
+    },
+    "reconcile-visits": {
+        "task": "apps.analytics.tasks.reconcile_visits",
+        "schedule": 3600.0,
+    },
+    "rollup-visits": {
+        "task": "apps.analytics.tasks.rollup_visits",
+        "schedule": 3600.0,
+    },
+    "prune-visits": {
+        "task": "apps.analytics.tasks.prune_visits",
+        "schedule": 86400.0,
+    },
+    "write-queued-comments": {
+        "task": "apps.weblog.tasks.write_queued_comments",
+        "schedule": 5.0,
+    },
+    "rebuild-related-articles": {
+        "task": "apps.weblog.tasks.update_related_articles",
+        "schedule": 86400.0,  # daily, picks up vocabulary and idf drift
+    },
+    "flush-article-views": {
+        "task": "apps.weblog.tasks.flush_article_views",
+        "schedule": 60.0,
+    },
     "refresh-discord-status": {
         "task": "apps.integrations.tasks.refresh_discord_status",
         "schedule": 240.0,  # 4 minutes (cache: 5 min)
@@ -129,8 +172,4 @@ CELERY_BEAT_SCHEDULE = {
         "task": "apps.integrations.tasks.refresh_github_contributions",
         "schedule": 7020.0,  # 1h 57min (cache: 2 hours)
     },
-    "cleanup-stale-online-users": {
-        "task": "apps.hangout.tasks.cleanup_stale_online_users",
-        "schedule": 120.0,
-    },
 }
\ No newline at end of file
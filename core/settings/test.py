@@ -0,0 +1,39 @@
+import os
+
+os.environ.setdefault("SECRET_KEY", "test")
+
+from .base import *
+
+# Test settings, no external services needed
+DEBUG = False
+
+ALLOWED_HOSTS = ["testserver", "localhost", "127.0.0.1"]
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "test.sqlite3",
+    }
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
+
+# visits are recorded in redis, tests exercise the middleware directly
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware != "apps.analytics.middleware.AnalyticsMiddleware"
+]
+
+CELERY_TASK_ALWAYS_EAGER = True
+
+WEBLOG_BAKE_ROOT = ""
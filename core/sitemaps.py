@@ -1,8 +1,19 @@
+import math
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.views.decorators.http import condition
 from apps.weblog.models import Article
 
 
+SITEMAP_KEY = "sitemap:{name}"
+SITEMAP_CONTENT_TYPE = "application/xml; charset=utf-8"
+
+
 class StaticViewSitemap(Sitemap):
     priority = 0.8
     changefreq = "yearly"
@@ -33,17 +44,148 @@ class ArticleSitemap(Sitemap):
     protocol = "https"
 
     def items(self):
-        return Article.published.all()
+        return Article.published.only("slug", "published_at", "updated_at")
 
     def lastmod(self, obj):
-        return obj.published_at
+        return obj.updated_at
 
     def location(self, obj):
         return reverse("weblog:article_page", args=[obj.slug])
 
 
-sitemaps = {
-    "static": StaticViewSitemap,
-    "weblog": WeblogSitemap,
-    "articles": ArticleSitemap,
-}
\ No newline at end of file
+def _render_urlset(urls):
+    return render_to_string("sitemap.xml", {"urlset": urls}).encode("utf-8")
+
+
+def _page_urls(site):
+    urls = []
+    for sitemap_class in (StaticViewSitemap, WeblogSitemap):
+        urls.extend(sitemap_class().get_urls(site=site, protocol="https"))
+    return urls
+
+
+def _article_shard_urls(shard, site):
+    """Fetch one shard of articles, oldest first so new posts land in the last shard"""
+    size = settings.SITEMAP_SHARD_SIZE
+    rows = (
+        Article.published
+        .order_by("published_at", "pk")
+        .values_list("slug", "updated_at")[shard * size:(shard + 1) * size]
+    )
+
+    return [
+        {
+            "location": f"https://{site.domain}{reverse('weblog:article_page', args=[slug])}",
+            "lastmod": updated_at,
+            "changefreq": ArticleSitemap.changefreq,
+            "priority": str(ArticleSitemap.priority),
+            "alternates": [],
+        }
+        for slug, updated_at in rows
+    ]
+
+
+def _store(name, content, last_modified):
+    cache.set(
+        SITEMAP_KEY.format(name=name),
+        {"content": content, "last_modified": last_modified},
+        None
+    )
+
+
+def refresh_sitemap(published_at=None, membership_changed=True):
+    """
+    Rebuild the article shard holding `published_at` and, when articles were
+    added or removed, every later shard whose boundaries moved. Without
+    `published_at` or stored metadata everything is rebuilt.
+    """
+    site = Site.objects.get_current()
+    size = settings.SITEMAP_SHARD_SIZE
+    meta = cache.get(SITEMAP_KEY.format(name="meta"))
+
+    total = Article.published.count()
+    shard_count = max(math.ceil(total / size), 1)
+
+    if meta is None or published_at is None:
+        first_shard, membership_changed = 0, True
+        lastmods = [None] * shard_count
+    else:
+        position = Article.published.filter(published_at__lt=published_at).count()
+        first_shard = min(position // size, shard_count - 1)
+        lastmods = (meta["lastmods"] + [None] * shard_count)[:shard_count]
+
+    shards = range(first_shard, shard_count) if membership_changed else [first_shard]
+    first_shard_urls = None
+
+    for shard in shards:
+        urls = _article_shard_urls(shard, site)
+        lastmods[shard] = max((url["lastmod"] for url in urls), default=None)
+        _store(shard + 1, _render_urlset(urls), lastmods[shard])
+        if shard == 0:
+            first_shard_urls = urls
+
+    if meta is not None:
+        for stale in range(shard_count, meta["shard_count"]):
+            cache.delete(SITEMAP_KEY.format(name=stale + 1))
+
+    page_urls = _page_urls(site)
+    _store("pages", _render_urlset(page_urls), None)
+
+    last_modified = max((lastmod for lastmod in lastmods if lastmod), default=None)
+
+    # a single shard is served directly, more become a sitemap index
+    if shard_count == 1:
+        if first_shard_urls is None:
+            first_shard_urls = _article_shard_urls(0, site)
+        root = _render_urlset(page_urls + first_shard_urls)
+    else:
+        entries = [{"location": f"https://{site.domain}{reverse('sitemap_section', args=['pages'])}"}]
+        entries += [
+            {
+                "location": f"https://{site.domain}{reverse('sitemap_section', args=[shard + 1])}",
+                "last_mod": lastmods[shard],
+            }
+            for shard in range(shard_count)
+        ]
+        root = render_to_string("sitemap_index.xml", {"sitemaps": entries}).encode("utf-8")
+
+    _store("root", root, last_modified)
+    cache.set(
+        SITEMAP_KEY.format(name="meta"),
+        {"shard_count": shard_count, "lastmods": lastmods},
+        None
+    )
+
+
+def _is_known_section(section):
+    """Whether `section` should exist, so junk shard numbers can't trigger rebuilds"""
+    meta = cache.get(SITEMAP_KEY.format(name="meta"))
+    if meta is None or section in (None, "pages"):
+        return True
+    return 1 <= int(section) <= meta["shard_count"]
+
+
+def _get_document(section):
+    key = SITEMAP_KEY.format(name=section or "root")
+    document = cache.get(key)
+
+    # rebuild when any expected document was evicted, not only the metadata
+    if document is None and _is_known_section(section):
+        refresh_sitemap()
+        document = cache.get(key)
+
+    return document
+
+
+def _sitemap_last_modified(request, section=None):
+    document = _get_document(section)
+    return document["last_modified"] if document else None
+
+
+@condition(last_modified_func=_sitemap_last_modified)
+def sitemap_view(request, section=None):
+    document = _get_document(section)
+    if document is None:
+        raise Http404("No such sitemap section")
+
+    return HttpResponse(document["content"], content_type=SITEMAP_CONTENT_TYPE)
@@ -16,24 +16,24 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
-from django.contrib.sitemaps.views import sitemap
+from django.urls import path, re_path, include
 from django.conf import settings
-from core.sitemaps import (
-    StaticViewSitemap, 
-    WeblogSitemap, 
-    ArticleSitemap,
-)
-from core.sitemaps import sitemaps
+from core.sitemaps import sitemap_view
+from apps.analytics.views import runtime_stats
 
 
 urlpatterns = [
+    # before the admin so its catch-all doesn't claim the path
+    path("admin/runtime-stats/", runtime_stats, name="runtime_stats"),
     path("admin/", admin.site.urls),
     path("", include("apps.pages.urls")),
     path("weblog/", include("apps.weblog.urls")),
-    path("sitemap.xml/", sitemap, {
-        "sitemaps": sitemaps
-        }, name="django.contrib.sitemaps.views.sitemap")
+    path("sitemap.xml/", sitemap_view, name="django.contrib.sitemaps.views.sitemap"),
+    re_path(
+        r"^sitemap-(?P<section>pages|\d+)\.xml/$",
+        sitemap_view,
+        name="sitemap_section"
+    ),
 ]
 
 handler404 = "apps.pages.views.custom_404"